@@ -0,0 +1,86 @@
+"""Peak memory and time of smc_archive over ranges of several years.
+
+A synthetic SMC calendar (benchmarks.synthetic.CalendarSite) is served by a
+local HTTP server and archived for each number of --years into a fresh
+database, with the peak memory traced by tracemalloc. The peak should not grow
+with the number of years. The archive is then queried for one month and for
+one series over the whole range.
+
+Run from the repository root:
+ python -m benchmarks.bench_archive --years 1 2 4
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import tempfile
+import time
+import tracemalloc
+
+import entry_store
+import smc_scraper
+from benchmarks import synthetic
+from benchmarks.fixtures import FixtureServer
+from utility import DEFAULT_PARSER, PARSERS
+
+START = datetime.date(2030, 1, 1)
+SERIES = synthetic.SERIES[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--per-day", type=int, default=4)
+    parser.add_argument("--window", type=int, default=28)
+    parser.add_argument("--workers", type=int, default=smc_scraper.MAX_WORKERS)
+    parser.add_argument("--parser", choices=PARSERS, default=DEFAULT_PARSER)
+    args = parser.parse_args()
+
+    server = FixtureServer(synthetic.CalendarSite(args.per_day)).start()
+    smc_scraper.SMC_URL = server.url
+    smc_scraper.configure_cache(enabled=False)
+    print(
+        f"{'years':>5}{'entries':>9}{'archive s':>11}{'peak MB':>9}"
+        f"{'month ms':>10}{'series ms':>11}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for years in args.years:
+            stop = START.replace(year=START.year + years) - datetime.timedelta(days=1)
+            path = os.path.join(directory, f"archive{years}.sqlite")
+            with entry_store.EntryStore(path) as store:
+                with open(os.devnull, "w") as devnull:
+                    with contextlib.redirect_stdout(devnull):
+                        tracemalloc.start()
+                        start = time.perf_counter()
+                        smc_scraper.archive_entries(
+                            START,
+                            stop,
+                            "en",
+                            store,
+                            args.window,
+                            parser=args.parser,
+                            max_workers=args.workers,
+                        )
+                        seconds = time.perf_counter() - start
+                        _, peak = tracemalloc.get_traced_memory()
+                        tracemalloc.stop()
+                entries = sum(1 for _ in store.iter_entries("en", START, stop))
+
+                start = time.perf_counter()
+                month_start = stop - datetime.timedelta(days=30)
+                month = len(store.entries("en", month_start, stop))
+                month_seconds = time.perf_counter() - start
+                start = time.perf_counter()
+                series = sum(1 for _ in store.iter_entries("en", START, stop, SERIES))
+                series_seconds = time.perf_counter() - start
+            print(
+                f"{years:>5}{entries:>9}{seconds:>11.2f}{peak / 2**20:>9.2f}"
+                f"{month_seconds * 1000:>10.2f}{series_seconds * 1000:>11.2f}"
+                f"  ({month} entries in the last month,"
+                f" {series} of {SERIES})"
+            )
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Time of the English and Swedish digests: two runs of semads.py against
+one run with --lang both.
+
+A synthetic bilingual SMC calendar (benchmarks.synthetic.CalendarSite) is
+served locally, each page after --latency seconds as from a slow server, and
+the digests of --weeks weeks are written in both languages, either by a run
+per language or by one run fetching both calendars concurrently. The digests
+of --lang both also include the entries listed in one language only, and
+must list every entry once, although some are listed on another day and
+with another slug in Swedish. The entries of both languages merged must be in
+calendar order, with every occurrence of a weekly seminar listed in English
+only in some weeks.
+
+Run from the repository root:
+ python -m benchmarks.bench_bilingual --weeks 4 --latency 1
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import re
+import tempfile
+import time
+
+import semads
+import smc_scraper
+from benchmarks import synthetic
+from benchmarks.fixtures import FixtureServer
+
+# A Monday
+START = datetime.date(2030, 1, 7)
+# The calendar URLs of a digest, with the calendar ID of their entry
+CALENDAR_URL_RE = re.compile(r"/kalender/\S*-(\d+\.\d+)$", re.MULTILINE)
+
+
+class SlowSite:
+    def __init__(self, site, latency):
+        self.site = site
+        self.latency = latency
+
+    def get(self, path):
+        time.sleep(self.latency)
+        return self.site.get(path)
+
+
+def check_once(directory):
+    """Check that no entry is listed twice in the digests of `directory`"""
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not os.path.isfile(path):
+            continue
+        with open(path) as digest:
+            ids = CALENDAR_URL_RE.findall(digest.read())
+        repeated = sorted(
+            content_id for content_id in set(ids) if ids.count(content_id) > 1
+        )
+        if repeated:
+            raise AssertionError(f"Entries listed twice in {name}: {repeated}")
+
+
+def check_merged(start, stop):
+    """Check the merged entries of both calendars from start to stop"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        entries = smc_scraper.fetch_languages(start, stop, ["en", "sv"])
+    merged = smc_scraper.merge_languages([entries["en"], entries["sv"]])
+    days = [smc_scraper.entry_key(entry)[1] for entry in merged]
+    if days != sorted(days):
+        raise AssertionError("Merged entries not in calendar order")
+    recurring = [
+        day
+        for entry, day in zip(merged, days)
+        if entry.title.endswith(synthetic.RECURRING_SEMINAR)
+    ]
+    # start is a Monday
+    weeks = (stop - start).days // 7 + 1
+    mondays = [start + number * smc_scraper.WEEK for number in range(weeks)]
+    if recurring != mondays:
+        raise AssertionError(f"{synthetic.RECURRING_SEMINAR} merged on {recurring}")
+
+
+def run(server, runs):
+    requests = server.requests
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for argv in runs:
+            semads.main(argv)
+    return time.perf_counter() - start, server.requests - requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--weeks", type=int, default=4)
+    parser.add_argument("--per-day", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds")
+    args = parser.parse_args()
+
+    site = synthetic.CalendarSite(args.per_day, bilingual=True)
+    server = FixtureServer(SlowSite(site, args.latency)).start()
+    smc_scraper.SMC_URL = server.url
+    print(f"{'runs':<16}{'seconds':>9}{'requests':>10}")
+    with tempfile.TemporaryDirectory() as directory:
+        common = [f"--start={START:%Y%m%d}", f"--weeks={args.weeks}", "--no-cache"]
+        for name, runs in [
+            (
+                "en, then sv",
+                [
+                    common
+                    + ["--lang", lang, "--archive-dir", os.path.join(directory, lang)]
+                    for lang in ["en", "sv"]
+                ],
+            ),
+            (
+                "--lang both",
+                [common + ["--lang", "both", "--archive-dir", directory]],
+            ),
+        ]:
+            seconds, requests = run(server, runs)
+            print(f"{name:<16}{seconds:>9.2f}{requests:>10}")
+        check_once(directory)
+    check_merged(START, START + args.weeks * smc_scraper.WEEK)
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Row lookups of smc_scraper on a large synthetic calendar page: one pass over
+the rows of each entry (entry_rows) against scanning all rows for every
+lookup (the previous find_row).
+
+Run from the repository root:
+ python -m benchmarks.bench_entry_rows --entries 5000
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import time
+
+import smc_scraper
+from benchmarks import synthetic
+from smc_scraper import ALTERNATE_SPEAKER_TAGS
+from utility import parse_html, unescape_html
+
+LOCATION_CLASS = "calendar__eventinfo-location"
+
+
+def previous_find_row(entry, header, class_=None):
+    divs = (
+        entry.find_all("p", class_=class_) if class_ is not None else entry.find_all("p")
+    )
+    for div in divs:
+        terms = div()
+        with contextlib.suppress(IndexError):
+            if terms[0].string.strip() == header:
+                return unescape_html(terms[1].string.strip())
+    return ""
+
+
+def previous_fields(entry):
+    location = previous_find_row(entry, "Location:", LOCATION_CLASS)
+    video = previous_find_row(entry, "Video link:", LOCATION_CLASS)
+    speakers = [previous_find_row(entry, f"{tag}:") for tag in ALTERNATE_SPEAKER_TAGS]
+    return location, video, speakers
+
+
+def single_pass_fields(entry):
+    rows = smc_scraper.entry_rows(entry)
+    location = smc_scraper.find_row_value(rows, "Location:", LOCATION_CLASS)
+    video = smc_scraper.find_row_value(rows, "Video link:", LOCATION_CLASS)
+    speakers = [
+        smc_scraper.find_row_value(rows, f"{tag}:") for tag in ALTERNATE_SPEAKER_TAGS
+    ]
+    return location, video, speakers
+
+
+def best_time(function, entries, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for entry in entries:
+            function(entry)
+        seconds = time.perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    page = synthetic.calendar_page(datetime.date(2030, 1, 7), args.entries)
+    entries = parse_html(page, smc_scraper.CALENDAR_ENTRIES).find_all(
+        "li", class_="calendar__event"
+    )
+    for entry in entries:
+        if previous_fields(entry) != single_pass_fields(entry):
+            raise AssertionError(f"Different fields for {entry}")
+
+    previous = best_time(previous_fields, entries, args.repeat)
+    single_pass = best_time(single_pass_fields, entries, args.repeat)
+    with contextlib.redirect_stdout(io.StringIO()):
+        parse = best_time(smc_scraper.parse_calendar_entry, entries, args.repeat)
+    print(f"{len(entries)} calendar entries ({len(page) / 2**20:.1f} MB page)")
+    for name, seconds in [
+        ("row lookups, find_row per lookup", previous),
+        ("row lookups, single pass", single_pass),
+        ("parse_calendar_entry", parse),
+    ]:
+        print(f"  {name:<34}{seconds * 1e6 / len(entries):8.1f} µs/entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+"""Cold and warm cache runs of iml_scraper.fetch_entries over a semester.
+
+A synthetic IML site (benchmarks/synthetic.py) with the programs and seminars
+of a semester around today is served locally, and fetched into a new cache
+database, once cold and then --warm times with the session reopened as in a
+new run. The cache layer of iml_scraper (expiry dates in their own table,
+written in one transaction, WAL) is compared to the previous one, which saved
+every response again to change its expiry date. Besides the time of the runs
+(mostly parsing), the responses written to the cache and the time spent
+setting expiry dates are reported.
+
+Run from the repository root:
+ python -m benchmarks.bench_iml_cache --per-day 5 --warm 3
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import tempfile
+import time
+
+import requests_cache
+from requests_cache.backends.sqlite import SQLiteDict
+
+import iml_scraper
+from benchmarks import synthetic
+from benchmarks.fixtures import FixtureServer
+
+SEMESTER_DAYS = 140
+
+
+def previous_set_expire(
+    url, response, forever=False, date=None, days=0, hours=0, minutes=0
+):
+    """
+    iml_scraper.set_expire before the expiry table, but with an aware date:
+    requests_cache 1.x compares it with the aware expiry of cached responses
+    """
+    cache = getattr(iml_scraper.get_session(), "cache", None)
+    if cache is None:
+        return
+    if date is None:
+        date = datetime.datetime.now(datetime.timezone.utc)
+    old_expires = response.expires
+    if forever:
+        new_expires = None
+        update = old_expires is not None
+    else:
+        new_expires = date + datetime.timedelta(days=days, hours=hours, minutes=minutes)
+        update = old_expires is None or new_expires < old_expires
+    if update:
+        cache.save_response(response, cache_key=response.cache_key, expires=new_expires)
+
+
+@contextlib.contextmanager
+def previous_cache_layer():
+    current = iml_scraper.get, iml_scraper.set_expire
+    iml_scraper.get = lambda url, **kwargs: iml_scraper.get_session().get(url, **kwargs)
+    iml_scraper.set_expire = previous_set_expire
+    try:
+        yield
+    finally:
+        iml_scraper.get, iml_scraper.set_expire = current
+
+
+def open_session(path, layer):
+    """Open the cache at `path` as a new run of iml_scraper would"""
+    if layer == "previous":
+        iml_scraper.session = requests_cache.CachedSession(path, backend="sqlite")
+        iml_scraper.expiry = None
+    else:
+        iml_scraper.session = requests_cache.CachedSession(
+            path, backend="sqlite", wal=True
+        )
+        iml_scraper.expiry = iml_scraper.Expiry(iml_scraper.session.cache.db_path)
+
+
+@contextlib.contextmanager
+def counted(owner, name, counts):
+    """Count the calls of owner.name, and the time they take, in `counts`"""
+    function = getattr(owner, name)
+
+    def wrapper(*args, **kwargs):
+        begin = time.perf_counter()
+        try:
+            return function(*args, **kwargs)
+        finally:
+            counts[name] = counts.get(name, 0) + 1
+            counts["seconds"] += time.perf_counter() - begin
+
+    setattr(owner, name, wrapper)
+    try:
+        yield
+    finally:
+        setattr(owner, name, function)
+
+
+def run(server, path, layer, start, stop):
+    open_session(path, layer)
+    requests = server.requests
+    writes = {"seconds": 0.0}
+    expiry = {"seconds": 0.0}
+    begin = time.perf_counter()
+    with contextlib.ExitStack() as stack:
+        stack.enter_context(counted(SQLiteDict, "_write", writes))
+        stack.enter_context(counted(iml_scraper, "set_expire", expiry))
+        if iml_scraper.expiry is not None:
+            stack.enter_context(counted(iml_scraper.expiry, "flush", expiry))
+        devnull = stack.enter_context(open(os.devnull, "w"))
+        stack.enter_context(contextlib.redirect_stderr(devnull))
+        entries = iml_scraper.fetch_entries(start, stop)
+    seconds = time.perf_counter() - begin
+    iml_scraper.session.close()
+    return (
+        seconds,
+        server.requests - requests,
+        len(entries),
+        writes.get("_write", 0),
+        expiry["seconds"],
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--per-day", type=int, default=5, help="seminars per day")
+    parser.add_argument("--warm", type=int, default=3, help="number of warm runs")
+    args = parser.parse_args()
+
+    start = datetime.date.today() - datetime.timedelta(days=SEMESTER_DAYS // 2)
+    stop = start + datetime.timedelta(days=SEMESTER_DAYS - 1)
+    server = FixtureServer().start()
+    iml_scraper.IML_URL = server.url
+    server.pages = synthetic.iml_site(
+        server.url, start, SEMESTER_DAYS * args.per_day, args.per_day
+    )
+    print(
+        f"{'cache layer':<12}{'run':>7}{'seconds':>9}{'requests':>10}{'entries':>9}"
+        f"{'writes':>8}{'expiry ms':>11}"
+    )
+    with tempfile.TemporaryDirectory() as directory:
+        for layer in ["previous", "current"]:
+            path = os.path.join(directory, f"{layer}.sqlite")
+            context = previous_cache_layer() if layer == "previous" else None
+            with context or contextlib.nullcontext():
+                for number in range(args.warm + 1):
+                    seconds, requests, entries, writes, expiry = run(
+                        server, path, layer, start, stop
+                    )
+                    name = "cold" if number == 0 else f"warm {number}"
+                    print(
+                        f"{layer:<12}{name:>7}{seconds:>9.3f}{requests:>10}{entries:>9}"
+                        f"{writes:>8}{expiry * 1000:>11.1f}"
+                    )
+    iml_scraper.session = iml_scraper.expiry = None
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
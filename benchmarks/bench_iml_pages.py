@@ -0,0 +1,94 @@
+"""Requests, time and peak memory of iml_scraper.fetch_programs for the coming
+month, with ordered pagination and with the full scan.
+
+A synthetic IML site (benchmarks/synthetic.py) with --years of programs up to
+a month ahead is served locally. The full scan is what fetch_programs does by
+default; the ordered pagination is measured with iml_scraper.PROGRAM_ORDER set
+to the query by which the synthetic site orders the programs by start date.
+Both must find the same programs, although the last one was published long
+before the others.
+
+Run from the repository root:
+ python -m benchmarks.bench_iml_pages --years 25
+"""
+import argparse
+import contextlib
+import datetime
+import os
+import time
+import tracemalloc
+
+import requests
+
+import iml_scraper
+from benchmarks import synthetic
+from benchmarks.fixtures import FixtureServer
+
+SEMINARS_PER_DAY = 2
+MONTH = 30
+MONTH_AHEAD = MONTH * SEMINARS_PER_DAY
+
+
+def measure(server, start, stop):
+    iml_scraper.session = requests.Session()
+    iml_scraper.expiry = None
+    before = server.requests
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stderr(devnull):
+        tracemalloc.start()
+        try:
+            begin = time.perf_counter()
+            entries = iml_scraper.fetch_programs(start, stop)
+            seconds = time.perf_counter() - begin
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    return entries, server.requests - before, seconds, peak
+
+
+def key(entry):
+    return entry["dates"], entry["link"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--years", type=int, default=25)
+    args = parser.parse_args()
+
+    today = datetime.date.today()
+    first = today - datetime.timedelta(days=365 * args.years)
+    count = (today - first).days * SEMINARS_PER_DAY + MONTH_AHEAD
+    server = FixtureServer().start()
+    iml_scraper.IML_URL = server.url
+    site = synthetic.iml_site(server.url, first, count, SEMINARS_PER_DAY)
+    # Only the pages of programs are needed
+    site = {
+        path: page for path, page in site.items() if path.startswith("/wp-json/")
+    }
+    pages = sum(1 for path in site if synthetic.ORDER in path)
+    start, stop = today, today + datetime.timedelta(days=MONTH)
+
+    server.pages = site
+    iml_scraper.PROGRAM_ORDER = synthetic.ORDER
+    ordered = measure(server, start, stop)
+    iml_scraper.PROGRAM_ORDER = None
+    full_scan = measure(server, start, stop)
+    server.stop()
+    iml_scraper.session = None
+    # The ordered pages list the programs in another order
+    if sorted(ordered[0], key=key) != sorted(full_scan[0], key=key):
+        raise AssertionError("Ordered pagination and full scan found other entries")
+
+    print(
+        f"{pages} pages of programs over {args.years} years,"
+        f" {len(ordered[0])} in the window"
+    )
+    print(f"  {'pagination':<12}{'requests':>9}{'seconds':>9}{'peak MB':>9}")
+    for name, (_, requests_count, seconds, peak) in [
+        ("ordered", ordered),
+        ("full scan", full_scan),
+    ]:
+        print(f"  {name:<12}{requests_count:>9}{seconds:>9.3f}{peak / 2**20:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Speedup of parsing the calendar entries in processes (semads.py --jobs).
+
+The entries of a large synthetic calendar page are parsed serially, as
+smc_scraper.fetch_entries does by default (lxml parser), and with
+smc_scraper.parse_in_processes for each number of --jobs, including the start
+of the process pool. The parsed entries must be the same in every run.
+
+Run from the repository root:
+ python -m benchmarks.bench_parallel_parse --entries 5000 --jobs 1 2 4
+"""
+import argparse
+import contextlib
+import datetime
+import io
+import os
+import time
+
+import smc_scraper
+from benchmarks import synthetic
+from utility import parse_html
+
+
+def parse_serially(page):
+    html = parse_html(page, smc_scraper.CALENDAR_ENTRIES, "lxml")
+    return smc_scraper.parse_calendar(html, "en")
+
+
+def parse_in_processes(page, jobs):
+    with smc_scraper.parsing_processes(jobs) as processes:
+        return smc_scraper.parse_in_processes(page, processes, jobs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=5000)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    page = synthetic.calendar_page(datetime.date(2030, 1, 7), args.entries).encode()
+    runs = [("serial", parse_serially)] + [
+        (f"{jobs} jobs", lambda page, jobs=jobs: parse_in_processes(page, jobs))
+        for jobs in args.jobs
+    ]
+    print(f"{args.entries} calendar entries, {os.cpu_count()} CPUs")
+    print(f"  {'parsing':<10}{'seconds':>9}{'speedup':>9}")
+    expected = serial_seconds = None
+    for name, parse in runs:
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            entries = parse(page)
+            seconds = time.perf_counter() - start
+        if expected is None:
+            expected, serial_seconds = entries, seconds
+        elif entries != expected:
+            raise AssertionError(f"Parsing with {name} gave other entries")
+        print(f"  {name:<10}{seconds:>9.2f}{serial_seconds / seconds:>9.2f}")
+
+
+if __name__ == "__main__":
+    main()
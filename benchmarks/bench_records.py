@@ -0,0 +1,107 @@
+"""Memory of the calendar entries of smc_scraper: the slotted records with
+shared values (smc_scraper.Record) against the NamedTuples they replaced.
+
+The entries of a large synthetic calendar page are parsed with
+smc_scraper.parse_calendar_entry, once with each kind of record, and the
+memory they keep (traced by tracemalloc once the page is parsed) is reported.
+
+Run from the repository root:
+ python -m benchmarks.bench_records --entries 20000
+"""
+from __future__ import annotations
+
+import argparse
+import contextlib
+import datetime
+import io
+import pickle
+import time
+import tracemalloc
+from datetime import date
+from typing import NamedTuple
+
+import smc_scraper
+from benchmarks import synthetic
+from utility import parse_html, unescape_html
+
+
+class Event(NamedTuple):
+    start_day: date
+    end_day: date | None
+    title: str
+    location: str | None
+    series: str
+    calendar_url: str
+
+
+class Seminar(NamedTuple):
+    day: date
+    start_time: datetime.time | None
+    end_time: datetime.time | None
+    speaker: str | None
+    title: str
+    location: str | None
+    series: str
+    calendar_url: str
+
+
+def parse_all(entries):
+    unescape_html.cache_clear()
+    with contextlib.redirect_stdout(io.StringIO()):
+        return [smc_scraper.parse_calendar_entry(entry) for entry in entries]
+
+
+def parse(entries, types):
+    """
+    Parse `entries` into Event and Seminar of `types`, and return them with
+    the bytes they retain and the parse time (of a run without tracing)
+    """
+    smc_scraper.Event, smc_scraper.Seminar = types
+    start = time.perf_counter()
+    parse_all(entries)
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    try:
+        records = parse_all(entries)
+        unescape_html.cache_clear()
+        retained, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return records, retained, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--entries", type=int, default=20000)
+    args = parser.parse_args()
+
+    page = synthetic.calendar_page(datetime.date(2030, 1, 7), args.entries)
+    entries = parse_html(page, smc_scraper.CALENDAR_ENTRIES).find_all(
+        "li", class_="calendar__event"
+    )
+    records = (smc_scraper.Event, smc_scraper.Seminar)
+    try:
+        results = {
+            "NamedTuple": parse(entries, (Event, Seminar)),
+            "slotted, shared values": parse(entries, records),
+        }
+    finally:
+        smc_scraper.Event, smc_scraper.Seminar = records
+    previous, current = (result[0] for result in results.values())
+    if [entry._asdict() for entry in previous] != [
+        entry._asdict() for entry in current
+    ]:
+        raise AssertionError("The records have different fields")
+
+    print(f"{len(entries)} calendar entries")
+    print(f"  {'records':<24}{'bytes/entry':>12}{'pickled':>10}{'parse µs':>10}")
+    for name, (parsed, retained, seconds) in results.items():
+        print(
+            f"  {name:<24}{retained / len(parsed):>12.0f}"
+            f"{len(pickle.dumps(parsed)) / len(parsed):>10.0f}"
+            f"{seconds * 1e6 / len(parsed):>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+"""Time and peak memory of the scraping stages as the calendars grow.
+
+Synthetic SMC calendar pages and IML sites (see benchmarks/synthetic.py) of
+each size are served by a local HTTP server, and every stage is run on them:
+
+ parse_calendar_entry  smc_scraper.parse_calendar_entry on every calendar entry
+ scrape                smc_scraper.scrape (fetch and parse the calendar page)
+ scrape_and_format     semads.main (the digest text)
+ render                render.write of the scraped entries in every format
+ parse_seminars        iml_scraper.parse_seminars on fetched seminar pages
+ iml_fetch_entries     iml_scraper.fetch_entries (WordPress JSON and pages)
+ matches               iml_scraper.CalendarIndex.find for one IML entry per
+                       calendar seminar
+
+The time is the best of --repeat runs, the peak memory is measured in a
+separate run with tracemalloc. A stage is flagged as super-linear if the slope
+of log(time) against log(size), fitted over the sizes from --fit-from, exceeds
+--max-slope; the exit status is then 1.
+
+Run from the repository root:
+ python -m benchmarks.bench_scaling --sizes 10 100 1000 10000
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import contextlib
+import datetime
+import math
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import iml_scraper
+import render
+import semads
+import smc_scraper
+from benchmarks import synthetic
+from benchmarks.fixtures import FixtureServer
+from utility import parse_html, unescape_html
+
+START = datetime.date(2030, 1, 7)
+PER_DAY = 10
+
+
+def iml_session():
+    """A fresh session like iml_scraper.session, without the on-disk cache"""
+    try:
+        import requests_cache
+    except ImportError:
+        import requests
+
+        return requests.Session()
+    return requests_cache.CachedSession(backend="memory")
+
+
+def completed(result):
+    future = concurrent.futures.Future()
+    future.set_result(result)
+    return future
+
+
+def iml_entry(seminar: smc_scraper.Seminar, same: bool) -> dict:
+    """An IML entry which matches `seminar` or only differs by its title"""
+    start_time = seminar.start_time.strftime("%H:%M") if seminar.start_time else ""
+    end_time = seminar.end_time.strftime("%H:%M") if seminar.end_time else ""
+    return {
+        "title": seminar.title if same else f"{seminar.title} (draft)",
+        "speaker": seminar.speaker,
+        "dates": (seminar.day, seminar.day),
+        "time": f"{start_time} - {end_time}",
+    }
+
+
+def prepare(server: FixtureServer, size: int, output: str) -> dict:
+    """Serve the fixtures of `size` entries and return the stages to run"""
+    stop = START + datetime.timedelta(days=synthetic.calendar_days(size, PER_DAY) - 1)
+    calendar_url = smc_scraper.construct_url(START, stop, "en")
+    server.pages = {
+        calendar_url[len(smc_scraper.SMC_URL) :]: (
+            synthetic.calendar_page(START, size, PER_DAY).encode(),
+            {"Content-Type": "text/html; charset=utf-8"},
+        )
+    }
+    server.pages.update(synthetic.iml_site(server.url, START, size, PER_DAY))
+
+    entries = parse_html(
+        server.pages[calendar_url[len(smc_scraper.SMC_URL) :]][0],
+        smc_scraper.CALENDAR_ENTRIES,
+    ).find_all("li", class_="calendar__event")
+
+    iml_scraper.session = iml_session()
+    seminar_responses = [
+        (f"{server.url}{path}", iml_scraper.session.get(f"{server.url}{path}"))
+        for path in server.pages
+        if path.startswith("/seminar/")
+    ]
+
+    smc_scraper.configure_cache(enabled=False)
+    calendar = smc_scraper.scrape(START, stop, stop, "en", None)
+    iml_entries = [
+        iml_entry(seminar, index % 2 == 0) for index, seminar in enumerate(calendar[1])
+    ]
+    semads_argv = [
+        "--start",
+        START.isoformat(),
+        "--stop-events",
+        stop.isoformat(),
+        "--stop-seminars",
+        stop.isoformat(),
+        "--output",
+        output,
+        "--no-cache",
+    ]
+
+    def parse_calendar_entries():
+        unescape_html.cache_clear()
+        for entry in entries:
+            smc_scraper.parse_calendar_entry(entry)
+
+    def scrape():
+        smc_scraper.scrape(START, stop, stop, "en", None)
+
+    def scrape_and_format():
+        semads.main(semads_argv)
+
+    def render_formats():
+        digest = render.Digest(START, stop, *calendar)
+        for format in render.FORMATS:
+            render.write(os.devnull, format, digest)
+
+    def parse_seminars():
+        iml_scraper.parse_seminars(
+            [(link, completed(response)) for link, response in seminar_responses]
+        )
+
+    def iml_fetch_entries():
+        iml_scraper.session = iml_session()
+        iml_scraper.fetch_entries(START, stop)
+
+    def matches():
+        index = iml_scraper.CalendarIndex(calendar)
+        for entry in iml_entries:
+            index.find(entry)
+
+    return {
+        "parse_calendar_entry": parse_calendar_entries,
+        "scrape": scrape,
+        "scrape_and_format": scrape_and_format,
+        "render": render_formats,
+        "parse_seminars": parse_seminars,
+        "iml_fetch_entries": iml_fetch_entries,
+        "matches": matches,
+    }
+
+
+def measure(run, repeat: int) -> tuple[float, int]:
+    """Best time of `repeat` runs and peak traced memory of another run"""
+    seconds = math.inf
+    with open(os.devnull, "w") as devnull:
+        with contextlib.redirect_stdout(devnull), contextlib.redirect_stderr(devnull):
+            for _ in range(repeat):
+                start = time.perf_counter()
+                run()
+                seconds = min(seconds, time.perf_counter() - start)
+            tracemalloc.start()
+            try:
+                run()
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+    return seconds, peak
+
+
+def slope(points: list[tuple[int, float]]) -> float | None:
+    """Least-squares slope of log(time) against log(size)"""
+    if len(points) < 2:
+        return None
+    xs = [math.log(size) for size, _ in points]
+    ys = [math.log(max(seconds, 1e-9)) for _, seconds in points]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    return sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys)) / sum(
+        (x - mean_x) ** 2 for x in xs
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--stages", nargs="+", help="only run these stages")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument(
+        "--fit-from",
+        type=int,
+        default=100,
+        help="smallest size used to fit the scaling exponent",
+    )
+    parser.add_argument(
+        "--max-slope",
+        type=float,
+        default=1.3,
+        help="flag stages whose time grows faster than size to this power",
+    )
+    args = parser.parse_args()
+
+    server = FixtureServer().start()
+    smc_scraper.SMC_URL = server.url
+    iml_scraper.IML_URL = server.url
+    timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "message.txt")
+        print(f"{'stage':<22}{'size':>7}{'seconds':>10}{'µs/entry':>10}{'peak MB':>9}")
+        for size in args.sizes:
+            with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+                stages = prepare(server, size, output)
+            for name, run in stages.items():
+                if args.stages and name not in args.stages:
+                    continue
+                seconds, peak = measure(run, args.repeat)
+                timings.setdefault(name, []).append((size, seconds))
+                print(
+                    f"{name:<22}{size:>7}{seconds:>10.4f}"
+                    f"{seconds / size * 1e6:>10.1f}{peak / 2**20:>9.2f}"
+                )
+    server.stop()
+
+    print()
+    super_linear = []
+    for name, points in timings.items():
+        exponent = slope([point for point in points if point[0] >= args.fit_from])
+        if exponent is None:
+            print(f"{name:<22} not enough sizes from {args.fit_from} to fit")
+            continue
+        flag = ""
+        if exponent > args.max_slope:
+            flag = "  SUPER-LINEAR"
+            super_linear.append(name)
+        print(f"{name:<22} time ~ size^{exponent:.2f}{flag}")
+    if super_linear:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
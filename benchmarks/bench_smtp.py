@@ -0,0 +1,115 @@
+"""Throughput of smtp_delivery.deliver against a local SMTP stand-in.
+
+Run from the repository root:
+ python -m benchmarks.bench_smtp --recipients 2000 --connections 1 2 4 8
+ python -m benchmarks.bench_smtp --batch-size 1 10 50 --connections 4
+
+By default every message is built separately, as the mailer used to; with
+--batch-size the message is built once and sent to batches of recipients.
+The stand-in drops the connection after every --drop-every messages, which
+are then possibly delivered, and must not deliver any message twice.
+"""
+import argparse
+import email.policy
+import smtplib
+import time
+from email.mime.text import MIMEText
+
+import smtp_delivery
+from benchmarks.smtp_standin import StandIn
+from smtp_delivery import Envelope
+
+SENDER = "kalendarium@math-stockholm.se"
+# The previous mailer paused this long after every message
+PREVIOUS_PAUSE = 0.3
+
+
+def envelopes(recipients, body):
+    for recipient in recipients:
+        message = MIMEText(body, _charset="utf-8")
+        message["To"] = recipient
+        message["From"] = SENDER
+        message["Subject"] = "Seminars"
+        yield Envelope(SENDER, [recipient], message.as_string())
+
+
+def batched_envelopes(recipients, body, batch_size):
+    message = MIMEText(body, _charset="utf-8")
+    message["To"] = "undisclosed-recipients:;"
+    message["From"] = SENDER
+    message["Subject"] = "Seminars"
+    message = message.as_bytes(policy=email.policy.compat32.clone(linesep="\r\n"))
+    for batch in smtp_delivery.batches(recipients, batch_size):
+        yield Envelope(SENDER, batch, message)
+
+
+def run(server, envelopes, connections, rate):
+    statuses = smtp_delivery.deliver(
+        envelopes,
+        connect=lambda: smtplib.SMTP("127.0.0.1", server.port),
+        connections=connections,
+        rate=rate,
+        retry_delay=0.01,
+    )
+    failed = sum(not status.ok and not status.uncertain for status in statuses)
+    possibly = sum(status.uncertain for status in statuses)
+    return failed, possibly
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--recipients", type=int, default=2000)
+    parser.add_argument("--connections", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--rate", type=float, help="messages per second")
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        nargs="+",
+        help="build the message once and send it to this many recipients at once",
+    )
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.002,
+        help="delay of the stand-in before each reply (seconds)",
+    )
+    parser.add_argument(
+        "--drop-every",
+        type=int,
+        default=500,
+        help="let the stand-in drop the connection after this many messages",
+    )
+    args = parser.parse_args()
+
+    recipients = [f"user{index}@example.com" for index in range(args.recipients)]
+    body = "Seminars this week.\n\n" * 500
+    print(
+        f"{args.recipients} messages, previous mailer (one connection, "
+        f"{PREVIOUS_PAUSE}s pause): at least {args.recipients * PREVIOUS_PAUSE:.0f}s"
+    )
+    for batch_size in args.batch_size or [None]:
+        for connections in args.connections:
+            if batch_size is None:
+                label = ""
+                messages = envelopes(recipients, body)
+            else:
+                label = f"batches of {batch_size:3d}, "
+                messages = batched_envelopes(recipients, body, batch_size)
+            server = StandIn(latency=args.latency, drop_every=args.drop_every).start()
+            start = time.perf_counter()
+            failed, possibly = run(server, messages, connections, args.rate)
+            seconds = time.perf_counter() - start
+            server.shutdown()
+            server.server_close()
+            print(
+                f"  {label}{connections:3d} connections: {seconds:7.2f}s"
+                f" {args.recipients / seconds:8.1f} recipients/s"
+                f" ({server.messages} transactions), {failed} failed,"
+                f" {possibly} possibly delivered, {server.duplicates()} duplicates"
+            )
+            if server.duplicates():
+                raise AssertionError("Messages delivered twice")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""Startup time of the scripts for runs that do no work (help, invalid options).
+
+Each command is run --repeat times in a new interpreter and the median wall
+time is reported, together with the heavy modules it imported. Use --root to
+time another checkout (e.g. a git worktree of an older revision) from the
+same place.
+
+Run from the repository root:
+ python -m benchmarks.bench_startup --repeat 10
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HEAVY_MODULES = ["requests", "requests_cache", "bs4", "lxml"]
+COMMANDS = [
+    ["smc.py", "--help"],
+    ["smc.py", "digest", "--help"],
+    ["smc.py", "iml", "--help"],
+    ["smc.py", "send", "--help"],
+    ["smc.py", "archive", "--help"],
+    ["smc.py", "watch", "--help"],
+    ["smc.py", "tex", "--help"],
+    # Invalid arguments: stop date before start date
+    [
+        "smc.py",
+        "digest",
+        "--start",
+        "20240110",
+        "--stop-seminars",
+        "20240101",
+        "--output",
+        os.devnull,
+    ],
+    ["semads.py", "--help"],
+    ["iml_scraper.py", "--help"],
+    ["seminarmailer.py", "--help"],
+    ["smc_archive.py", "--help"],
+    ["digest_watch.py", "--help"],
+    ["tex2polopoly.py", "--help"],
+]
+# Run a script and print the heavy modules it imported, even if it exits
+REPORT_IMPORTS = (
+    "import runpy, sys\n"
+    "sys.argv = {argv!r}\n"
+    "try:\n"
+    "    runpy.run_path(sys.argv[0], run_name='__main__')\n"
+    "finally:\n"
+    "    print('imported:', *(m for m in {modules!r} if m in sys.modules))\n"
+)
+
+
+def run(root, command):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, *command],
+        cwd=root,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return time.perf_counter() - start
+
+
+def imported_modules(root, command):
+    completed = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            REPORT_IMPORTS.format(modules=HEAVY_MODULES, argv=command),
+        ],
+        cwd=root,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.DEVNULL,
+        text=True,
+    )
+    for line in reversed(completed.stdout.splitlines()):
+        if line.startswith("imported:"):
+            return line[len("imported:") :].strip()
+    return ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument(
+        "--root",
+        default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        help="directory with the scripts",
+    )
+    args = parser.parse_args()
+
+    print(f"{'command':<40}{'median ms':>10}  heavy imports")
+    for command in COMMANDS:
+        if not os.path.exists(os.path.join(args.root, command[0])):
+            continue
+        times = [run(args.root, command) for _ in range(args.repeat)]
+        label = " ".join(command[:3]) + (" ..." if len(command) > 3 else "")
+        print(
+            f"{label:<40}{statistics.median(times) * 1000:>10.0f}"
+            f"  {imported_modules(args.root, command) or '-'}"
+        )
+
+
+if __name__ == "__main__":
+    main()
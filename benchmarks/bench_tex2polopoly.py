@@ -0,0 +1,128 @@
+"""Throughput of tex2polopoly.py against convert-tex-to-polopoly.sh.
+
+--files synthetic abstracts (paragraphs with math, emphasis, quotes and
+non-breaking spaces) are written to a temporary directory and converted to
+HTML: by the shell script once per file, and by tex2polopoly.py in one
+process and with each number of --jobs. The outputs must be the same.
+tex2polopoly.convert_entry is also checked on a synthetic IML seminar page
+parsed by iml_scraper.parse_seminar.
+
+Run from the repository root:
+ python -m benchmarks.bench_tex2polopoly --files 200 --jobs 2 4
+"""
+import argparse
+import datetime
+import os
+import random
+import subprocess
+import tempfile
+import time
+
+import iml_scraper
+import tex2polopoly
+from benchmarks import synthetic
+from utility import parse_html
+
+SCRIPT = "convert-tex-to-polopoly.sh"
+WORDS = ["the", "space", "of", "curves", "is", "proper", "and", "we", "show", "that"]
+TEX = [
+    "$x^2 + y^2$",
+    r"\emph{stable}",
+    r"\textit{moduli}",
+    "``main theorem''",
+    "`genus'",
+    "Theorem~1",
+    r"Dr.\ Smith",
+]
+
+
+def abstract(rnd: random.Random) -> str:
+    paragraphs = []
+    for _ in range(rnd.randint(1, 4)):
+        words = [
+            rnd.choice(TEX) if rnd.random() < 0.1 else rnd.choice(WORDS)
+            for _ in range(rnd.randint(30, 120))
+        ]
+        lines = range(0, len(words), 12)
+        paragraphs.append("\n".join(" ".join(words[i : i + 12]) for i in lines))
+    return "\n\n".join(paragraphs) + "\n"
+
+
+def read_outputs(directory: str, names: list[str]) -> list[bytes]:
+    outputs = []
+    for name in names:
+        with open(os.path.join(directory, name + ".html"), "rb") as output:
+            outputs.append(output.read())
+    return outputs
+
+
+def check_entry():
+    """Check convert_entry on the output of iml_scraper.parse_seminar"""
+    page = synthetic.iml_seminar_page(
+        r"Curves on $\overline{M}_{g,n}$ and \emph{stability}",
+        "Anna Andersson",
+        datetime.date(2030, 1, 7),
+        "10:00 - 11:00",
+    )
+    entry = iml_scraper.parse_seminar(parse_html(page, iml_scraper.SEMINAR_PAGE))
+    converted = tex2polopoly.convert_entry(entry, ["title", "Location"])
+    expected = {
+        **entry,
+        "title": '<p>Curves on <span class="math-tex">\\(\\overline{M}_{g,n}\\)</span>'
+        " and <i>stability</i></p>",
+        "other_fields": {**entry["other_fields"], "Location": "<p>Seminar room</p>"},
+    }
+    if converted != expected:
+        raise AssertionError(f"convert_entry gave {converted}")
+    try:
+        tex2polopoly.convert_entry(entry, ["Abstract"])
+    except KeyError:
+        pass
+    else:
+        raise AssertionError("convert_entry accepted a field the entry does not have")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--jobs", type=int, nargs="+", default=[2, 4])
+    args = parser.parse_args()
+
+    check_entry()
+    rnd = random.Random(0)
+    with tempfile.TemporaryDirectory() as directory:
+        sources = os.path.join(directory, "tex")
+        os.mkdir(sources)
+        names = [f"abstract{number:05d}" for number in range(args.files)]
+        size = 0
+        for name in names:
+            with open(os.path.join(sources, name + ".tex"), "w") as tex:
+                size += tex.write(abstract(rnd))
+        files = tex2polopoly.input_files([sources])
+
+        output_dir = os.path.join(directory, "script")
+        os.mkdir(output_dir)
+        start = time.perf_counter()
+        for source, name in zip(files, names):
+            with open(os.path.join(output_dir, name + ".html"), "wb") as output:
+                subprocess.run(["bash", SCRIPT, source], stdout=output, check=True)
+        results = [("shell script", time.perf_counter() - start)]
+        expected = read_outputs(output_dir, names)
+
+        for jobs in [1] + args.jobs:
+            output_dir = os.path.join(directory, f"python{jobs}")
+            os.mkdir(output_dir)
+            start = time.perf_counter()
+            tex2polopoly.convert_files(files, output_dir, jobs)
+            results.append((f"python, {jobs} jobs", time.perf_counter() - start))
+            if read_outputs(output_dir, names) != expected:
+                raise AssertionError(f"Different output with {jobs} jobs")
+
+    print(f"{args.files} files, {size / 1024:.0f} kB, {os.cpu_count()} CPUs")
+    print(f"  {'converter':<18}{'seconds':>9}{'files/s':>10}")
+    for name, seconds in results:
+        print(f"  {name:<18}{seconds:>9.3f}{args.files / seconds:>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""Microbenchmark of utility.unescape_html against parsing every string with
+BeautifulSoup (the previous implementation).
+
+Run from the repository root:
+ python -m benchmarks.bench_unescape
+"""
+import argparse
+import timeit
+
+from utility import soup_unescape_html, unescape_html
+
+# Titles, speakers, series, rooms and links as they appear in the calendar
+# (after the first round of unescaping by BeautifulSoup).
+CALENDAR_STRINGS = [
+    "Analysis Seminar",
+    "Algebra and Geometry Seminar",
+    "SMC Colloquium",
+    "Stockholm-Uppsala Logic Seminar",
+    "Cramér room, Albano, house 1, floor 3",
+    "Room 3418, Lindstedtsvägen 25, KTH",
+    "Kovalevsky room, Albano",
+    "https://kth-se.zoom.us/j/64175413937",
+    "https://stockholmuniversity.zoom.us/j/69226372221",
+    "Anna Andersson (KTH)",
+    "Dmitri Östlund (Stockholm University)",
+    "Carla d&#39;Angelo (Università di Pisa)",
+    "Jean-Pierre L&#233;vy",
+    "On the &quot;structure&quot; of random matrices",
+    "Geometry &amp; Topology of moduli spaces",
+    "Sharp bounds for L&lt;sup&gt;p&lt;/sup&gt; norms",
+    "PhD thesis defense: Some title with a colon: and more",
+    "Mittag-Leffler &ndash; Program opening",
+    "Licentiate seminar",
+    "Zoom",
+]
+
+
+def measure(function, strings, number):
+    return min(
+        timeit.repeat(
+            lambda: [function(string) for string in strings], number=number, repeat=5
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--number", type=int, default=200, help="passes per timing")
+    args = parser.parse_args()
+
+    strings = CALENDAR_STRINGS
+    for string in strings:
+        if unescape_html(string) != soup_unescape_html(string):
+            raise AssertionError(f"Different results for {string!r}")
+
+    calls = len(strings) * args.number
+    soup = measure(soup_unescape_html, strings, args.number)
+    uncached = measure(unescape_html.__wrapped__, strings, args.number)
+    cached = measure(unescape_html, strings, args.number)
+    print(f"{calls} calls on {len(strings)} calendar strings")
+    for name, seconds in [
+        ("BeautifulSoup", soup),
+        ("fast path", uncached),
+        ("fast path, memoized", cached),
+    ]:
+        print(
+            f"  {name:<20} {seconds * 1e6 / calls:8.2f} µs/call"
+            f"  ({soup / seconds:6.1f}x)"
+        )
+
+
+if __name__ == "__main__":
+    main()
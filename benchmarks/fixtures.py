@@ -0,0 +1,51 @@
+"""A local HTTP server for benchmark fixtures.
+
+Serves a dict of pages keyed by path and query, as (body, headers), and counts
+the requests it receives. Unknown paths get a 404.
+"""
+import http.server
+import threading
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        page = self.server.pages.get(self.path)
+        with self.server.lock:
+            self.server.requests += 1
+        if page is None:
+            self.send_error(404)
+            return
+        body, headers = page
+        self.send_response(200)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FixtureServer(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, pages=None, port=0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.pages = pages if pages is not None else {}
+        self.requests = 0
+        self.lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
@@ -0,0 +1,116 @@
+"""A local stand-in for an SMTP server, for testing and benchmarking the mailer.
+
+It accepts any login and any message (without storing it, but counting the
+deliveries to each recipient), optionally waits `latency` seconds before each
+reply and drops the connection after every `drop_every` messages, once their
+data is received.
+
+Run from the repository root to use it with seminarmailer.py:
+ python -m benchmarks.smtp_standin --port 8025
+ python seminarmailer.py --smtp-host localhost --smtp-port 8025 --no-tls ...
+"""
+import argparse
+import collections
+import socketserver
+import threading
+import time
+
+
+class Handler(socketserver.StreamRequestHandler):
+    def reply(self, line: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+        self.wfile.write(f"{line}\r\n".encode())
+        self.wfile.flush()
+
+    def handle(self):
+        server = self.server
+        self.reply("220 localhost SMTP stand-in")
+        recipients = []
+        messages = 0
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode(errors="replace").strip()
+            verb = command.split(" ", 1)[0].upper()
+            if verb == "EHLO":
+                self.wfile.write(b"250-localhost\r\n250-AUTH PLAIN LOGIN\r\n")
+                self.reply("250 8BITMIME")
+            elif verb == "HELO":
+                self.reply("250 localhost")
+            elif verb == "AUTH":
+                self.reply("235 Authentication successful")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip().strip("<>")
+                if address.startswith("refuse"):
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while self.rfile.readline() not in (b".\r\n", b".\n", b""):
+                    pass
+                with server.lock:
+                    server.messages += 1
+                    server.deliveries += len(recipients)
+                    server.delivered.update(recipients)
+                messages += 1
+                if server.drop_every and messages % server.drop_every == 0:
+                    return
+                self.reply("250 OK queued")
+            elif verb in ("RSET", "NOOP"):
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class StandIn(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, port=0, latency=0.0, drop_every=0):
+        super().__init__(("127.0.0.1", port), Handler)
+        self.latency = latency
+        self.drop_every = drop_every
+        self.messages = 0
+        self.deliveries = 0
+        self.delivered = collections.Counter()
+        self.lock = threading.Lock()
+
+    def duplicates(self) -> int:
+        """The number of deliveries of a message to a recipient a second time"""
+        return sum(count - 1 for count in self.delivered.values())
+
+    @property
+    def port(self):
+        return self.server_address[1]
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency", type=float, default=0.0, metavar="SECONDS")
+    parser.add_argument("--drop-every", type=int, default=0, metavar="MESSAGES")
+    args = parser.parse_args()
+    server = StandIn(args.port, args.latency, args.drop_every)
+    print(f"SMTP stand-in listening on localhost:{server.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{server.messages} messages to {server.deliveries} recipients")
+
+
+if __name__ == "__main__":
+    main()
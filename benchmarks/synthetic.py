@@ -0,0 +1,347 @@
+"""Synthetic SMC calendar pages and IML WordPress sites for the benchmarks.
+
+The markup mimics the parts of the real pages that smc_scraper and iml_scraper
+read, with some surrounding noise (navigation, footers) so that the parsers
+have realistic work to skip. Everything is generated from a seed, so runs are
+reproducible.
+"""
+from __future__ import annotations
+
+import datetime
+import json
+import math
+import random
+import re
+import urllib.parse
+
+SERIES = [
+    "Analysis Seminar",
+    "Algebra and Geometry Seminar",
+    "Seminar, Probability",
+    "Number Theory Seminar",
+    "PhD thesis defense",
+    "Conference",
+    "SMC Colloquium",
+]
+ROOMS = [
+    "Room 14, House 1, Albano",
+    "Cramér room, Albano",
+    "KTH, E52",
+    "Room 3418, Lindstedtsvägen 25",
+]
+SPEAKERS = [
+    "Anna Andersson (KTH)",
+    "Björn Berg (SU)",
+    "Carla d&#39;Angelo (Uppsala)",
+    "Dmitri Östlund",
+    "Eva Ek &amp; Fia Fors",
+]
+SPEAKER_TAGS = ["Lecturer", "Doctoral student", "Respondent", "Participating"]
+EVENT_TITLES = ["Workshop on Moduli", "Conference in Honour of A. B.", "Workshop &amp; school"]
+NAVIGATION = "".join(f'<li><a href="/menu/{index}">Menu {index}</a></li>' for index in range(150))
+
+# Longest span of the events of calendar_entry, in days
+MAX_EVENT_DAYS = 4
+ONLY_IN_ONE_LANGUAGE = 7
+RECURRING_SEMINAR = "Weekly seminar"
+START_DAY_RE = re.compile(r'class="startDate">\w+ ([\d-]+), ')
+END_DAY_RE = re.compile(r'class="endDate">\w+ ([\d-]+)')
+PROGRAMS_PER_PAGE = 100
+# A value of iml_scraper.PROGRAM_ORDER: programs by start date, newest first
+ORDER = "&orderby=custom_date&order=desc"
+SEMINARS_PER_PROGRAM = 20
+
+
+def calendar_entry(index: int, day: datetime.date, rnd: random.Random) -> str:
+    """One <li class="calendar__event"> of the SMC calendar"""
+    series = rnd.choice(SERIES)
+    # Events always span several days: single-day entries of an event series
+    # would be sorted against multi-day ones by smc_scraper.scrape.
+    end_day = None
+    if series in ("Conference", "SMC Colloquium") or rnd.random() < 0.03:
+        end_day = day + datetime.timedelta(days=rnd.randint(1, 4))
+    speaker = rnd.choice(SPEAKERS)
+    rows = []
+    if end_day is not None:
+        title = rnd.choice(EVENT_TITLES)
+    elif rnd.random() < 0.6:
+        title = f"{speaker}: On the &quot;structure&quot; of problem {index}"
+    else:
+        title = f"Talk number {index} &amp; friends"
+        rows.append(
+            '<p class="calendar__eventinfo">'
+            f'<span class="calendar__eventinfo-header">{rnd.choice(SPEAKER_TAGS)}:</span>'
+            f" <span>{speaker}</span></p>"
+        )
+    if rnd.random() < 0.9:
+        rows.append(
+            '<p class="calendar__eventinfo calendar__eventinfo-location">'
+            f"<span>Location:</span> <span>{rnd.choice(ROOMS)}</span></p>"
+        )
+    if rnd.random() < 0.3:
+        rows.append(
+            '<p class="calendar__eventinfo calendar__eventinfo-location">'
+            f"<span>Video link:</span> <span>https://kth-se.zoom.us/j/{index}</span></p>"
+        )
+    rows.append('<p class="calendar__eventinfo"><span>Contact:</span> <span>Someone</span></p>')
+    dates = f'<span class="startDate">{day:%a} {day.isoformat()}, </span>'
+    if end_day is not None:
+        dates += f'<span class="endDate">{end_day:%a} {end_day.isoformat()}</span>'
+    if rnd.random() < 0.9:
+        hour = rnd.randint(9, 16)
+        dates += (
+            f'<span class="startTime"> {hour:02d}:{rnd.choice([0, 15, 30]):02d}</span>'
+            f'<span class="endTime"> - {hour + 1:02d}:00</span>'
+        )
+    href = f"/en/kalender/event/talk-{index}-1.{100000 + index}?date={day.isoformat()}"
+    return (
+        '<li class="calendar__event">\n'
+        f'  <div class="calendar__eventtitle"><h3><a href="{href}" title="{title}">{title}</a></h3></div>\n'
+        f'  <p class="calendar calendar__eventinfo-startday">{dates}</p>\n'
+        f'  <p class="calendar__eventinfo--bold">{series}</p>\n'
+        f"  {''.join(rows)}\n"
+        "</li>"
+    )
+
+
+def swedish_entry(html: str) -> str:
+    """The calendar entry `html` as listed in the Swedish calendar"""
+    return (
+        html.replace("/en/kalender/event/talk-", "/kalender/evenemang/foredrag-")
+        .replace("/en/kalender/event/", "/kalender/evenemang/")
+        .replace('title="', 'title="SV ')
+    )
+
+
+def recurring_entry(day: datetime.date) -> str:
+    """
+    The calendar entry of RECURRING_SEMINAR on `day`: a weekly seminar, with
+    the same URL (and calendar ID) every week
+    """
+    return (
+        '<li class="calendar__event">\n'
+        '  <div class="calendar__eventtitle"><h3><a'
+        f' href="/en/kalender/event/weekly-seminar-1.99999?date={day.isoformat()}"'
+        f' title="{RECURRING_SEMINAR}">{RECURRING_SEMINAR}</a></h3></div>\n'
+        '  <p class="calendar calendar__eventinfo-startday">'
+        f'<span class="startDate">{day:%a} {day.isoformat()}, </span>'
+        '<span class="startTime"> 08:15</span><span class="endTime"> - 09:00</span></p>\n'
+        '  <p class="calendar__eventinfo--bold">Analysis Seminar</p>\n'
+        '  <p class="calendar__eventinfo"><span>Speaker:</span> <span>Someone</span></p>'
+        '<p class="calendar__eventinfo calendar__eventinfo-location">'
+        "<span>Location:</span> <span>KTH, E52</span></p>\n"
+        "</li>"
+    )
+
+
+def moved_entry(html: str) -> str:
+    """The Swedish calendar entry `html` listed a day later, with another slug"""
+    day = datetime.date.fromisoformat(START_DAY_RE.search(html)[1])
+    day += datetime.timedelta(days=1)
+    return START_DAY_RE.sub(
+        f'class="startDate">{day:%a} {day.isoformat()}, ', html
+    ).replace("/foredrag-", "/flyttat-foredrag-")
+
+
+def calendar_days(count: int, per_day: int) -> int:
+    return max(1, math.ceil(count / per_day))
+
+
+def calendar_page(
+    start: datetime.date, count: int, per_day: int = 10, seed: int = 0
+) -> str:
+    """A calendar page listing `count` entries, `per_day` per day from start"""
+    rnd = random.Random(seed)
+    return calendar_html(
+        calendar_entry(index, start + datetime.timedelta(days=index // per_day), rnd)
+        for index in range(count)
+    )
+
+
+def calendar_html(entries) -> str:
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"><title>Calendar</title></head>'
+        f"<body><header><ul>{NAVIGATION}</ul></header>"
+        f'<main><h1>Calendar</h1><ul class="calendar">{"".join(entries)}</ul></main>'
+        "<footer><p>Stockholm Mathematics Centre</p></footer></body></html>"
+    )
+
+
+class CalendarSite:
+    """
+    An SMC calendar with `per_day` entries every day, serving the page of any
+    range requested with smc_scraper.construct_url (as `pages` of a
+    FixtureServer). Every day always has the same entries, and events are
+    listed on the pages of all the ranges they overlap.
+
+    The Swedish calendar (/kalender) lists the same entries with Swedish URLs
+    and titles, except that with `bilingual`, one entry in ONLY_IN_ONE_LANGUAGE
+    is only listed in English, another one only in Swedish, and a third one
+    is listed a day later, with another slug, in Swedish. The bilingual
+    calendars also list RECURRING_SEMINAR every Monday, except in odd weeks in
+    English.
+    """
+
+    def __init__(self, per_day: int = 10, seed: int = 0, bilingual: bool = False):
+        self.per_day = per_day
+        self.seed = seed
+        self.bilingual = bilingual
+
+    def day_entries(self, day: datetime.date) -> list[tuple[datetime.date, str]]:
+        """The last day and markup of the entries starting on `day`"""
+        rnd = random.Random(self.seed * 10**7 + day.toordinal())
+        first = day.toordinal() * self.per_day
+        entries = []
+        for index in range(first, first + self.per_day):
+            html = calendar_entry(index, day, rnd)
+            match = END_DAY_RE.search(html)
+            end_day = datetime.date.fromisoformat(match[1]) if match else day
+            entries.append((end_day, html))
+        return entries
+
+    def get(self, path: str):
+        query = urllib.parse.parse_qs(urllib.parse.urlsplit(path).query)
+        if "date" not in query or "length" not in query:
+            return None
+        start = datetime.date.fromisoformat(query["date"][0])
+        stop = start + datetime.timedelta(days=int(query["length"][0]) - 1)
+        swedish = not path.startswith("/en/")
+        entries = []
+        day = start - datetime.timedelta(days=MAX_EVENT_DAYS)
+        while day <= stop:
+            if (
+                self.bilingual
+                and day >= start
+                and day.weekday() == 0
+                and (swedish or day.isocalendar()[1] % 2 == 0)
+            ):
+                html = recurring_entry(day)
+                entries.append(swedish_entry(html) if swedish else html)
+            first = day.toordinal() * self.per_day
+            for index, (end_day, html) in enumerate(self.day_entries(day), first):
+                # Entries 1 (mod ONLY_IN_ONE_LANGUAGE) are only in English, 2 in
+                # Swedish, and 3 are moved in Swedish
+                if end_day < start or (
+                    self.bilingual
+                    and index % ONLY_IN_ONE_LANGUAGE == (1 if swedish else 2)
+                ):
+                    continue
+                if swedish:
+                    html = swedish_entry(html)
+                    if self.bilingual and index % ONLY_IN_ONE_LANGUAGE == 3:
+                        html = moved_entry(html)
+                entries.append(html)
+            day += datetime.timedelta(days=1)
+        return (
+            calendar_html(entries).encode(),
+            {"Content-Type": "text/html; charset=utf-8"},
+        )
+
+
+def iml_seminar_page(title: str, speaker: str, day: datetime.date, time: str) -> str:
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>'
+        f"<header><ul>{NAVIGATION}</ul></header>"
+        f'<main><h1 class="article__title">{title}</h1><article>'
+        "<p>Institut Mittag-Leffler</p><p>Speaker</p>"
+        f"<p> {speaker} </p><p>Abstract with some &amp; text.</p>"
+        '<div class="event-info event-info--seminar">'
+        f"<p><strong>Date:</strong> {day.isoformat()}</p>"
+        f"<p><strong>Time:</strong> {time}</p>"
+        "<p><strong>Location:</strong> Seminar room</p>"
+        "</div></article></main><footer><p>Footer</p></footer></body></html>"
+    )
+
+
+def iml_program_page(seminar_links: list[str]) -> str:
+    items = "".join(
+        f'<li><a class="seminars__link" href="{link}">Seminar</a></li>'
+        for link in seminar_links
+    )
+    return (
+        '<!DOCTYPE html><html><head><meta charset="utf-8"></head><body>'
+        f"<header><ul>{NAVIGATION}</ul></header><main><h1>Program</h1>"
+        f'<section data-section="seminars"><ul>{items}</ul></section>'
+        "</main></body></html>"
+    )
+
+
+def iml_seminars(
+    start: datetime.date, count: int, per_day: int = 10, seed: int = 0
+) -> list[dict]:
+    """The fields of `count` IML seminars, `per_day` per day from start"""
+    rnd = random.Random(seed)
+    seminars = []
+    for index in range(count):
+        hour = rnd.randint(9, 16)
+        seminars.append(
+            {
+                "title": f"Lecture {index} on {rnd.choice(SERIES).lower()}",
+                "speaker": rnd.choice(SPEAKERS).replace("&amp;", "and"),
+                "day": start + datetime.timedelta(days=index // per_day),
+                "time": f"{hour:02d}:00 - {hour + 1:02d}:00",
+            }
+        )
+    return seminars
+
+
+def iml_site(
+    base_url: str, start: datetime.date, count: int, per_day: int = 10, seed: int = 0
+) -> dict[str, tuple[bytes, dict]]:
+    """
+    The pages of an IML site with `count` seminars in programs of
+    SEMINARS_PER_PROGRAM, keyed by path and query, as (body, headers).
+    """
+    seminars = iml_seminars(start, count, per_day, seed)
+    programs = [
+        seminars[first : first + SEMINARS_PER_PROGRAM]
+        for first in range(0, len(seminars), SEMINARS_PER_PROGRAM)
+    ]
+    html = {"Content-Type": "text/html; charset=utf-8"}
+    pages = {}
+    entries = []
+    for number, program in enumerate(programs):
+        links = []
+        for position, seminar in enumerate(program):
+            path = f"/seminar/{number}-{position}/"
+            links.append(f"{base_url}{path}")
+            page = iml_seminar_page(
+                seminar["title"], seminar["speaker"], seminar["day"], seminar["time"]
+            )
+            pages[path] = (page.encode(), html)
+        path = f"/program/{number}/"
+        pages[path] = (iml_program_page(links).encode(), html)
+        first, last = program[0]["day"], program[-1]["day"]
+        entries.append(
+            {
+                "title": {"rendered": f"Research program {number}"},
+                "link": f"{base_url}{path}",
+                "category": {"name": "Programs"},
+                "custom_date": f"{first:%b} {first.day} - {last:%b} {last.day} {last.year}",
+            }
+        )
+    total_pages = max(1, math.ceil(len(entries) / PROGRAMS_PER_PAGE))
+    # Programs are published about in the order they start, but the last one
+    # was published first, long before it runs
+    published = entries[-1:] + entries[:-1]
+    for order, ordered_entries in [("", published), (ORDER, entries[::-1])]:
+        for page in range(1, total_pages + 1):
+            chunk = ordered_entries[
+                (page - 1) * PROGRAMS_PER_PAGE : page * PROGRAMS_PER_PAGE
+            ]
+            pages[api_program_path(page, order)] = (
+                json.dumps(chunk).encode(),
+                {
+                    "Content-Type": "application/json",
+                    "X-WP-TotalPages": str(total_pages),
+                },
+            )
+    return pages
+
+
+def api_program_path(page: int, order: str = "") -> str:
+    """The path and query of iml_scraper.api_program_url(page, order)"""
+    return (
+        f"/wp-json/wp/v2/ventla_program?per_page=100&page={page}"
+        f"&lang=en&_fields=title.rendered,link,category.name,custom_date{order}"
+    )
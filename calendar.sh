@@ -39,9 +39,16 @@ week_number=$(date -d "${start_date}" +"%V")
 # ----------------------------------------------------------------------
 # Create email message:
 
-echo "Fetching seminars from $start_date to $end_date"
 message_file="Archive/seminars${year}_W${week_number}.txt"
-$python "$semads" --start "${start_date}" --stop-seminars "${end_date}" --output "$message_file" # --lang sv
+# Digest kept current by digest_watch.py, if it has checked it recently
+staged_file="Archive/staging/seminars${year}_W${week_number}.txt"
+if [[ -n $(find "$staged_file" -mmin -"${watch_max_age:-60}" 2>/dev/null) ]]; then
+  echo "Using $staged_file, checked by digest_watch.py"
+  cp "$staged_file" "$message_file"
+else
+  echo "Fetching seminars from $start_date to $end_date"
+  $python "$semads" --start "${start_date}" --stop-seminars "${end_date}" --output "$message_file" # --lang sv
+fi
 
 
 # ----------------------------------------------------------------------
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""Keep the digest of the coming week ready for calendar.sh.
+
+# Usage
+ python digest_watch.py --interval 30
+
+ Every 30 minutes, the calendar is fetched for the week calendar.sh would
+ send next (from the Monday before the next Wednesday to the Sunday after
+ it) and the digest is written to Archive/staging/seminarsYYYY_Www.txt. The
+ pages of the calendar are cached and revalidated, so that a poll of an
+ unchanged calendar downloads little, and the digest is only rewritten when
+ its text changes. Its modification time is updated at every successful
+ poll: calendar.sh copies the digest to Archive/seminarsYYYY_Www.txt instead
+ of running semads.py when it was checked within $watch_max_age minutes (see
+ config.default).
+
+ python digest_watch.py --once
+
+ The above run checks the digest once, e.g. from cron.
+"""
+from __future__ import annotations
+
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+import entry_store
+import render
+import smc_scraper
+from semads import archive_name, set_time_locale
+from utility import DEFAULT_PARSER, PARSERS
+
+STAGING_DIR = os.path.join("Archive", "staging")
+INTERVAL = 30
+WEDNESDAY = 2
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(
+        "--interval",
+        action="store",
+        type=int,
+        help=f"minutes between polls of the calendar (default: {INTERVAL})",
+        metavar="MINUTES",
+        default=INTERVAL,
+    )
+    parser.add_argument(
+        "--once",
+        action="store_true",
+        help="poll once and exit",
+    )
+    parser.add_argument(
+        "--staging-dir",
+        action="store",
+        help=f"directory of the digest (default: {STAGING_DIR})",
+        metavar="DIR",
+        default=STAGING_DIR,
+    )
+    parser.add_argument(
+        "--lang",
+        action="store",
+        choices=["en", "sv"],
+        help="language (sv/en)",
+        metavar="en|sv",
+        default="en",
+    )
+    parser.add_argument(
+        "--max-events",
+        action="store",
+        type=int,
+        help="maximum number of events, not counting ties (events before the seminar stop date are always included)",
+        default=5,
+    )
+    parser.add_argument(
+        "--parser",
+        action="store",
+        choices=PARSERS,
+        help="HTML parser backend (lxml only builds the calendar entries, bs4 the whole page)",
+        default=DEFAULT_PARSER,
+    )
+    parser.add_argument(
+        "--store",
+        action="store",
+        nargs="?",
+        const=entry_store.STORE_NAME,
+        help=f"keep parsed calendar entries in an SQLite database, to only parse changed entries and report changes at each poll (default: {entry_store.STORE_NAME})",
+        metavar="FILE",
+    )
+    return parser
+
+
+def upcoming_week(today: datetime.date) -> tuple[datetime.date, datetime.date]:
+    """
+    The start and seminar stop dates of calendar.sh on `today`: the Monday
+    before and the Sunday after the next Wednesday (strictly after today)
+    """
+    days = (WEDNESDAY - today.weekday() - 1) % 7 + 1
+    wednesday = today + datetime.timedelta(days=days)
+    return (
+        wednesday - datetime.timedelta(days=2),
+        wednesday + datetime.timedelta(days=4),
+    )
+
+
+def poll(args, store=None) -> str:
+    """
+    Write the digest of the coming week if its text has changed, and mark it
+    as checked. Returns its path.
+    """
+    start, stop_seminars = upcoming_week(datetime.date.today())
+    events, seminars = smc_scraper.scrape(
+        start=start,
+        stop_events=start + datetime.timedelta(days=62),  # as semads.py
+        stop_seminars=stop_seminars,
+        lang=args.lang,
+        max_events=args.max_events,
+        parser=args.parser,
+        store=store,
+    )
+    text = "".join(render.text(render.Digest(start, stop_seminars, events, seminars)))
+    path = os.path.join(args.staging_dir, archive_name(start))
+    try:
+        with open(path, encoding="utf-8") as digest:
+            changed = digest.read() != text
+    except FileNotFoundError:
+        changed = True
+    if changed:
+        # calendar.sh may copy the digest at any time: replace it at once
+        with tempfile.NamedTemporaryFile(
+            "w", encoding="utf-8", dir=args.staging_dir, delete=False
+        ) as digest:
+            digest.write(text)
+        os.replace(digest.name, path)
+    else:
+        os.utime(path)
+    action = "Wrote" if changed else "Checked"
+    print(f"{datetime.datetime.now():%Y-%m-%d %H:%M} {action} {path}")
+    return path
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+
+    if args.interval < 1:
+        raise ValueError("--interval must be at least 1")
+
+    set_time_locale()
+    os.makedirs(args.staging_dir, exist_ok=True)
+    # Pages the server does not let us revalidate are fetched again at each poll
+    smc_scraper.configure_cache(ttl=datetime.timedelta(minutes=args.interval))
+    store = entry_store.EntryStore(args.store) if args.store is not None else None
+    try:
+        while True:
+            try:
+                poll(args, store)
+            except Exception as error:
+                # Network errors, pages that cannot be parsed, full disks...:
+                # the last digest staged is kept, stale until a poll succeeds
+                print(
+                    f"{datetime.datetime.now():%Y-%m-%d %H:%M} Polling the calendar"
+                    f" failed: {type(error).__name__}: {error}",
+                    file=sys.stderr,
+                )
+                if args.once:
+                    raise
+            if args.once:
+                break
+            time.sleep(args.interval * 60)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if store is not None:
+            store.close()
+
+
+if __name__ == "__main__":
+    main()
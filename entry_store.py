@@ -0,0 +1,280 @@
+"""Local store of parsed SMC calendar entries.
+
+Entries are kept in an SQLite database keyed by their calendar URL (and start
+day, since recurring entries share the URL), together with a hash of the HTML
+they were parsed from. Calendar entries whose HTML is unchanged since the
+previous run are not parsed again, and a fetched date range that is recent
+enough can be served without fetching the calendar.
+"""
+from __future__ import annotations
+
+import datetime
+import hashlib
+import sqlite3
+from datetime import date, time
+from typing import Iterator, NamedTuple
+
+from smc_scraper import Event, Seminar, entry_key
+
+STORE_NAME = "smc_entries.sqlite"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    lang TEXT NOT NULL,
+    calendar_url TEXT NOT NULL,
+    start_day TEXT NOT NULL,
+    end_day TEXT,
+    kind TEXT NOT NULL,
+    start_time TEXT,
+    end_time TEXT,
+    speaker TEXT,
+    title TEXT NOT NULL,
+    location TEXT,
+    series TEXT NOT NULL,
+    html_hash TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    PRIMARY KEY (lang, calendar_url, start_day)
+);
+CREATE INDEX IF NOT EXISTS entries_by_hash ON entries (lang, html_hash);
+CREATE INDEX IF NOT EXISTS entries_by_day ON entries (lang, start_day);
+CREATE INDEX IF NOT EXISTS entries_by_series ON entries (lang, series, start_day);
+CREATE TABLE IF NOT EXISTS fetches (
+    lang TEXT NOT NULL,
+    start TEXT NOT NULL,
+    stop TEXT NOT NULL,
+    fetched_at TEXT NOT NULL
+);
+"""
+
+COLUMNS = (
+    "kind, start_day, end_day, start_time, end_time, speaker, title, location, "
+    "series, calendar_url"
+)
+
+
+class Changes(NamedTuple):
+    added: list[Event | Seminar]
+    changed: list[Event | Seminar]
+    removed: list[Event | Seminar]
+
+    def format(self) -> str:
+        lines = [
+            f"Calendar entries since the previous run: {len(self.added)} added, "
+            f"{len(self.changed)} changed, {len(self.removed)} removed"
+        ]
+        for sign, entries in [
+            ("+", self.added),
+            ("~", self.changed),
+            ("-", self.removed),
+        ]:
+            lines.extend(
+                f"  {sign} {first_day(entry)} {entry.title} ({entry.calendar_url})"
+                for entry in entries
+            )
+        return "\n".join(lines)
+
+
+class EntryStore:
+    def __init__(self, path: str = STORE_NAME):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.executescript(SCHEMA)
+        self._pending = []
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def parse(self, lang: str, html, parse) -> Event | Seminar:
+        """
+        Return the stored entry parsed from the same HTML as `html` (a
+        calendar entry), or else parse it with `parse`. The entry is
+        remembered for the next call to `update`.
+        """
+        html_hash = hashlib.sha1(str(html).encode()).hexdigest()
+        row = self.connection.execute(
+            f"SELECT {COLUMNS} FROM entries"
+            " WHERE lang = ? AND html_hash = ? LIMIT 1",
+            (lang, html_hash),
+        ).fetchone()
+        entry = from_row(row) if row is not None else parse(html)
+        self._pending.append((entry, html_hash))
+        return entry
+
+    def update(self, lang: str, start: date, stop: date) -> Changes:
+        """
+        Replace the stored entries from start to stop by the ones seen since
+        the previous update, and record the fetch of that range.
+        """
+        pending, self._pending = self._pending, []
+        stored = {
+            entry_key(entry): (entry, html_hash)
+            for entry, html_hash in (
+                (from_row(row[:-1]), row[-1])
+                for row in self.connection.execute(
+                    f"SELECT {COLUMNS}, html_hash FROM entries"
+                    " WHERE lang = ? AND start_day <= ?"
+                    " AND coalesce(end_day, start_day) >= ?",
+                    (lang, stop.isoformat(), start.isoformat()),
+                )
+            )
+        }
+        added, changed, seen = [], [], set()
+        with self.connection:
+            for position, (entry, html_hash) in enumerate(pending):
+                if entry_key(entry) in seen:
+                    continue
+                seen.add(entry_key(entry))
+                previous = stored.get(entry_key(entry))
+                if previous is None:
+                    added.append(entry)
+                elif previous[0] != entry:
+                    changed.append(entry)
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO entries VALUES"
+                    " (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    to_row(lang, entry, html_hash, position),
+                )
+            removed = [
+                entry
+                for stored_key, (entry, _) in stored.items()
+                if stored_key not in seen
+            ]
+            self.connection.executemany(
+                "DELETE FROM entries"
+                " WHERE lang = ? AND calendar_url = ? AND start_day = ?",
+                [
+                    (lang, entry.calendar_url, first_day(entry).isoformat())
+                    for entry in removed
+                ],
+            )
+            self.connection.execute(
+                "INSERT INTO fetches VALUES (?, ?, ?, ?)",
+                (
+                    lang,
+                    start.isoformat(),
+                    stop.isoformat(),
+                    datetime.datetime.now().isoformat(timespec="seconds"),
+                ),
+            )
+        return Changes(added, changed, removed)
+
+    def is_fresh(
+        self,
+        lang: str,
+        start: date,
+        stop: date,
+        max_age: datetime.timedelta | None = None,
+    ) -> bool:
+        """
+        Whether the range start to stop was fetched within `max_age` (or at
+        all if `max_age` is None)
+        """
+        query = "SELECT 1 FROM fetches WHERE lang = ? AND start <= ? AND stop >= ?"
+        parameters = [lang, start.isoformat(), stop.isoformat()]
+        if max_age is not None:
+            query += " AND fetched_at >= ?"
+            parameters.append((datetime.datetime.now() - max_age).isoformat())
+        return self.connection.execute(query, parameters).fetchone() is not None
+
+    def entries(self, lang: str, start: date, stop: date) -> list[Event | Seminar]:
+        """The stored entries from start to stop, in calendar order"""
+        return list(self.iter_entries(lang, start, stop))
+
+    def iter_entries(
+        self, lang: str, start: date, stop: date, series: str | None = None
+    ) -> Iterator[Event | Seminar]:
+        """
+        Like entries(), but one at a time from the database, and only those
+        of `series` if given
+        """
+        query = (
+            f"SELECT {COLUMNS} FROM entries"
+            " WHERE lang = ? AND start_day <= ? AND coalesce(end_day, start_day) >= ?"
+        )
+        parameters = [lang, stop.isoformat(), start.isoformat()]
+        if series is not None:
+            query += " AND series = ?"
+            parameters.append(series)
+        query += " ORDER BY start_day, position"
+        for row in self.connection.execute(query, parameters):
+            yield from_row(row)
+
+    def series_counts(
+        self, lang: str, start: date, stop: date
+    ) -> list[tuple[str, int]]:
+        """The series of the stored entries from start to stop, with their counts"""
+        return self.connection.execute(
+            "SELECT series, count(*) FROM entries"
+            " WHERE lang = ? AND start_day <= ?"
+            " AND coalesce(end_day, start_day) >= ?"
+            " GROUP BY series ORDER BY count(*) DESC, series",
+            (lang, stop.isoformat(), start.isoformat()),
+        ).fetchall()
+
+
+def first_day(entry: Event | Seminar) -> date:
+    return entry.start_day if isinstance(entry, Event) else entry.day
+
+
+def to_row(lang: str, entry: Event | Seminar, html_hash: str, position: int):
+    if isinstance(entry, Event):
+        kind, end_day, start_time, end_time, speaker = (
+            "event",
+            entry.end_day,
+            None,
+            None,
+            None,
+        )
+    else:
+        kind, end_day, start_time, end_time, speaker = (
+            "seminar",
+            None,
+            entry.start_time,
+            entry.end_time,
+            entry.speaker,
+        )
+    return (
+        lang,
+        entry.calendar_url,
+        first_day(entry).isoformat(),
+        end_day.isoformat() if end_day is not None else None,
+        kind,
+        start_time.isoformat() if start_time is not None else None,
+        end_time.isoformat() if end_time is not None else None,
+        speaker,
+        entry.title,
+        entry.location,
+        entry.series,
+        html_hash,
+        position,
+    )
+
+
+def from_row(row) -> Event | Seminar:
+    (
+        kind,
+        start_day,
+        end_day,
+        start_time,
+        end_time,
+        speaker,
+        title,
+        location,
+        series,
+        calendar_url,
+    ) = row
+    start_day = date.fromisoformat(start_day)
+    if kind == "event":
+        end_day = date.fromisoformat(end_day) if end_day is not None else None
+        return Event(start_day, end_day, title, location, series, calendar_url)
+    start_time = time.fromisoformat(start_time) if start_time is not None else None
+    end_time = time.fromisoformat(end_time) if end_time is not None else None
+    return Seminar(
+        start_day, start_time, end_time, speaker, title, location, series, calendar_url
+    )
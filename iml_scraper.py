@@ -1,88 +1,212 @@
 #!/usr/bin/env python3
 
+import argparse
+import concurrent.futures
 import contextlib
-import datetime, time
+import datetime
+import itertools
 import re
+import sqlite3
+import threading
+from collections import Counter, defaultdict, deque
 
-import requests
-from bs4 import BeautifulSoup
-
+import profiling
 import smc_scraper
+import transport
+import utility
+from utility import DEFAULT_PARSER, PARSERS, parse_html, xpath_class
 
 import sys
 
 DEBUG = False
 
+# Number of concurrent requests to the IML site.
+MAX_WORKERS = 4
+
+IML_URL = "https://www.mittag-leffler.se"
+
 SPEAKER_RE = re.compile("Speaker.*")
 DATE_RE = re.compile("Date:")
 TIME_RE = re.compile("Time:")
-
-def utc2local(utc):
-    epoch = time.mktime(utc.timetuple())
-    offset = datetime.datetime.fromtimestamp(epoch) - datetime.datetime.utcfromtimestamp(epoch)
-    return utc + offset
+TOKEN_RE = re.compile(r"\w+")
+
+# The WordPress API of the IML site orders the programs by publication date,
+# which says nothing about when they run, so all pages are fetched. For a site
+# that can order them by start date (custom_date), newest first, this is the
+# query to do so, and the pagination then stops at the first page whose
+# programs start more than MAX_PROGRAM_SPAN before the dates of interest.
+# See fetch_programs.
+PROGRAM_ORDER = None
+MAX_PROGRAM_SPAN = datetime.timedelta(days=366)
+
+# Minimal proportion of common words for titles to match in fuzzy mode
+FUZZY_THRESHOLD = 0.6
+
+# Subtrees of the IML pages needed by seminar_links and parse_seminar
+SEMINAR_SECTION = "//section[@data-section='seminars']"
+SEMINAR_PAGE = (
+    f"//h1[{xpath_class('article__title')}]"
+    f" | //div[{xpath_class('event-info--seminar')}]"
+    " | //p"
+)
 
 # IML web server is very slow. It also doesn't support neither Etag nor
 # last-modified. As a compromise we cache all pages but reload those that
 # change often and those that are near in time.
-try:
-    import requests_cache
-    session = requests_cache.CachedSession(cache_name='iml_cache', backend='sqlite')
-    print(f"Using cache ({session.cache.db_path}).", file=sys.stderr)
-    def is_cached(response):
-        return response.from_cache
-    def cache_info(response):
-        if( is_cached(response) ):
-            if( not response.expires ):
-                when = "forever"
-            else:
-                expiredate = utc2local(response.expires)
-                if( expiredate.date() != datetime.date.today() ):
-                    when = f"until {expiredate.date().isoformat()}"
-                else:
-                    when = f"until {expiredate.time().isoformat(timespec='minutes')}"
-            return f" [CACHED {when}{' expired!' if response.is_expired else ''}]"
-        else:
-            return ""
-    def set_expire(response,forever=False,date=datetime.datetime.utcnow(),days=0,hours=0,minutes=0):
-        # We update the cached response expiry date if either it is forever
-        # and we don't want it to be cached forever, or if it is not forever
-        # and we want it to be cached forever. In the other cases we only
-        # shorten the expiry date, never extend it. Otherwise cached entries
-        # could get an extended expiration date without ever being reloaded.
-        old_expires = response.expires
-        if( forever ):
-            new_expires = None
-            update = ( old_expires != None )
-        else:
-            new_expires = date+datetime.timedelta(days=days,hours=hours,minutes=minutes)
-            update = ( old_expires == None or new_expires < old_expires )
-        if( update ):
-            session.cache.save_response(response,cache_key=response.cache_key,expires=new_expires)
-except ImportError:
-    session = requests.Session()
-    def is_cached(response):
-        return False
-    def cache_info(response):
-        return ""
-    def set_expire(response,forever=False,date=None,days=0,hours=0,minutes=0):
-        pass
+# The session (and the cache) is only opened when first used, see get_session.
+# The cached responses never expire by themselves: their expiry dates are kept
+# by URL in the table of `expiry`, so that changing a date does not write the
+# whole response again, and get() downloads the pages whose date has passed.
+# The URLs are those requested with get(), before any redirect.
+session = None
+expiry = None
+_lock = threading.Lock()
+
+def get_session():
+    global session
+    with _lock:
+        if session is None:
+            # Recorded or replayed as configured in transport
+            session = transport.session(open_session)
+        return session
+
+
+def open_session():
+    global expiry
+    try:
+        import requests_cache
+    except ImportError:
+        import requests
+        return requests.Session()
+    cached = requests_cache.CachedSession(cache_name='iml_cache', backend='sqlite', wal=True)
+    expiry = Expiry(cached.cache.db_path)
+    print(f"Using cache ({cached.cache.db_path}).", file=sys.stderr)
+    return cached
+
+
+class Expiry:
+    """
+    Expiry dates (naive UTC, None for never) of the cached pages by URL, in a
+    table of the cache database. Dates are read once and changes are written
+    together by flush().
+    """
+
+    def __init__(self, path):
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS expiry (url TEXT PRIMARY KEY, expires TEXT)"
+        )
+        self.dates = {
+            url: datetime.datetime.fromisoformat(expires) if expires else None
+            for url, expires in self.connection.execute("SELECT * FROM expiry")
+        }
+        self.pending = {}
+
+    def expires(self, url):
+        return self.dates.get(url)
+
+    def is_expired(self, url):
+        expires = self.dates.get(url)
+        return expires is not None and expires <= datetime.datetime.utcnow()
+
+    def set(self, url, expires):
+        self.dates[url] = self.pending[url] = expires
+
+    def flush(self):
+        pending, self.pending = self.pending, {}
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO expiry VALUES (?, ?)",
+                [
+                    (url, expires.isoformat() if expires is not None else None)
+                    for url, expires in pending.items()
+                ],
+            )
+
+
+def get(url, **kwargs):
+    """Get `url` from the cache, or from the IML site if its expiry date has passed"""
+    session = get_session()
+    if expiry is not None and expiry.is_expired(url):
+        return session.get(url, force_refresh=True, **kwargs)
+    return session.get(url, **kwargs)
+
+
+def cache_info(url, response):
+    """utility.cache_info of the response to get(url), with the expiry date of url"""
+    if expiry is None or not getattr(response, "from_cache", False):
+        return utility.cache_info(response)
+    return utility.cache_status(expiry.expires(url), expired=expiry.is_expired(url))
+
+
+def set_expire(url,response,forever=False,date=None,days=0,hours=0,minutes=0):
+    if expiry is None:
+        return
+    if date is None:
+        date = datetime.datetime.utcnow()
+    # We update the cached response expiry date if either it is forever
+    # and we don't want it to be cached forever, or if it is not forever
+    # and we want it to be cached forever. In the other cases we only
+    # shorten the expiry date, never extend it. Otherwise cached entries
+    # could get an extended expiration date without ever being reloaded.
+    current = expiry.expires(url)
+    # A page that was just downloaded has no expiry date yet
+    old_expires = current if getattr(response, "from_cache", False) else None
+    if( forever ):
+        new_expires = None
+        update = ( current != None )
+    else:
+        new_expires = date+datetime.timedelta(days=days,hours=hours,minutes=minutes)
+        update = ( old_expires == None or new_expires < old_expires )
+    if( update ):
+        expiry.set(url, new_expires)
 
 def fetch_entries(
     start=datetime.date.today(),
     stop=datetime.date.today() + datetime.timedelta(days=14),
+    max_workers=MAX_WORKERS,
+    parser=DEFAULT_PARSER,
 ):
-    filtered = [
-        entry for entry in fetch_all_programs() if overlaps(start, stop, entry["dates"])
-    ]
-    expanded = [
-        sub_entry
-        for entry in filtered
-        for sub_entry in (
-            expand_program(entry) if entry["category"] == "Programs" else [entry]
-        )
-        if overlaps(start, stop, sub_entry["dates"])
-    ]
+    try:
+        return fetch_and_expand(start, stop, max_workers, parser)
+    finally:
+        # The expiry dates of all the pages of the run in one transaction
+        if expiry is not None:
+            expiry.flush()
+
+
+def fetch_and_expand(start, stop, max_workers, parser):
+    filtered = fetch_programs(start, stop, max_workers)
+    # One pool serves the pages of all programs and seminars. All program
+    # pages are requested up front, the seminar pages of a program as soon as
+    # its page has arrived, and the responses are then parsed in order while
+    # later pages are still downloading.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        program_responses = [
+            executor.submit(get, entry["link"])
+            if entry["category"] == "Programs"
+            else None
+            for entry in filtered
+        ]
+        seminar_requests = [
+            request_seminars(response.result(), executor, parser)
+            if response is not None
+            else None
+            for response in program_responses
+        ]
+        expanded = [
+            sub_entry
+            for entry, response, requests in zip(
+                filtered, program_responses, seminar_requests
+            )
+            for sub_entry in (
+                expand_program(entry, response.result(), requests, parser)
+                if response is not None
+                else [entry]
+            )
+            if overlaps(start, stop, sub_entry["dates"])
+        ]
     return sorted(expanded, key=lambda entry: entry["dates"])
 
 
@@ -94,22 +218,85 @@ def overlaps(start, stop, dates):
 # Fetch JSON from IML WordPress
 ######################################################################
 
-def fetch_all_programs():
+@profiling.spanned("fetch_programs")
+def fetch_programs(start, stop, max_workers=MAX_WORKERS):
+    """
+    The entries of the IML site (programs and others) which overlap start to
+    stop, kept while the pages are fetched.
+
+    If PROGRAM_ORDER is set, the pages are requested by start date, newest
+    first, and the pagination stops at a page whose entries start more than
+    MAX_PROGRAM_SPAN before start, as long as the start dates of the entries
+    seen are in descending order. Otherwise, if they are not or if the site
+    does not accept the order, all pages are fetched.
+    """
     print("Fetching IML site.", file=sys.stderr, end='')
-    response = session.get(api_program_url(1))
-    set_expire( response, hours=2 )
-    print(cache_info(response), file=sys.stderr)
+    order = PROGRAM_ORDER or ""
+    url = api_program_url(1, order)
+    response = get(url)
+    if order and not response.ok:
+        print(f" Ordered pages not available ({response.status_code}).", file=sys.stderr, end='')
+        order = ""
+        url = api_program_url(1, order)
+        response = get(url)
+    set_expire( url, response, hours=2 )
+    print(cache_info(url, response), file=sys.stderr)
+    ordered = bool(order)
+    previous_start = None
+    entries = []
+    # Ordered pages are fetched one ahead, so that no page after the last one
+    # needed is requested
+    ahead = 1 if ordered else max_workers
+    with contextlib.closing(program_pages(response, order, ahead)) as pages:
+        for page in pages:
+            entries.extend(entry for entry in page if overlaps(start, stop, entry["dates"]))
+            if not ordered or not page:
+                continue
+            # A program over new year has the year of its end date on both
+            # dates (see parse_dates), so the earlier date is the start
+            starts = [min(entry["dates"]) for entry in page]
+            sequence = ([previous_start] if previous_start is not None else []) + starts
+            if any(later > earlier for earlier, later in zip(sequence, sequence[1:])):
+                print("  Programs not in order of dates, fetching all pages.", file=sys.stderr)
+                ordered = False
+                continue
+            previous_start = starts[-1]
+            # The entries of the following pages start even earlier
+            if previous_start < start - MAX_PROGRAM_SPAN:
+                break
+    return entries
+
+
+def program_pages(response, order, ahead=MAX_WORKERS):
+    """
+    The trimmed entries of each page of programs, from the first page
+    `response`. The following pages are fetched concurrently, up to `ahead`
+    pages ahead of the consumer.
+    """
     pages_count = int(response.headers["X-WP-TotalPages"])
-    print(f"  Fetching {pages_count} pages.", file=sys.stderr)
-    return [
-        trim_entry(entry)
-        for page in range(1, pages_count + 1)
-        for entry in session.get(api_program_url(page)).json()
-    ]
+    print(f"  {pages_count} pages.", file=sys.stderr)
+    profiling.record_response("fetch_programs", response)
+    yield [trim_entry(entry) for entry in response.json()]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=ahead) as executor:
+        numbers = iter(range(2, pages_count + 1))
+        requests = deque(
+            executor.submit(get, api_program_url(number, order))
+            for number in itertools.islice(numbers, ahead)
+        )
+        try:
+            while requests:
+                page = requests.popleft().result()
+                for number in itertools.islice(numbers, 1):
+                    requests.append(executor.submit(get, api_program_url(number, order)))
+                profiling.record_response("fetch_programs", page)
+                yield [trim_entry(entry) for entry in page.json()]
+        finally:
+            for request in requests:
+                request.cancel()
 
 
-def api_program_url(page):
-    return f"https://www.mittag-leffler.se/wp-json/wp/v2/ventla_program?per_page=100&page={page}&lang=en&_fields=title.rendered,link,category.name,custom_date"
+def api_program_url(page, order=""):
+    return f"{IML_URL}/wp-json/wp/v2/ventla_program?per_page=100&page={page}&lang=en&_fields=title.rendered,link,category.name,custom_date{order}"
 
 
 #################################################################
@@ -151,42 +338,63 @@ def parse_full_date(date):
 # Parse IML program HTML page.
 ######################################################################
 
-def expand_program(program):
+@profiling.spanned("expand_program")
+def expand_program(program, response, seminar_requests, parser=DEFAULT_PARSER):
     print(f"Fetching program '{program['title']}' ({program['dates'][0]} - {program['dates'][1]}).", file=sys.stderr, end='')
-    response = session.get(program["link"])
-    set_expire( response, minutes=10 )
-    print(cache_info(response), file=sys.stderr)
-    link_content = response.text
+    set_expire( program["link"], response, minutes=10 )
+    profiling.record_response("expand_program", response)
+    print(cache_info(program["link"], response), file=sys.stderr)
     print(f"  Fetching seminars.", file=sys.stderr)
-    seminars = parse_seminars(BeautifulSoup(link_content, features="lxml"))
+    seminars = parse_seminars(seminar_requests, parser)
     return [program] + seminars
 
 
-def parse_seminars(html):
+def request_seminars(response, executor, parser=DEFAULT_PARSER):
+    """Submit the seminar pages linked from a program page to `executor`.
+
+    Returns a list of (link, future response) pairs in page order.
+    """
+    return [
+        (link, executor.submit(get, link, headers={"Accept-Encoding": "gzip, deflate, br"}))
+        for link in seminar_links(
+            parse_html(response.text, SEMINAR_SECTION, parser)
+        )
+    ]
+
+
+def seminar_links(html):
     seminar_section = html.find("section", {"data-section": "seminars"})
     if seminar_section is None:
         return []
-    seminars = []
+    links = []
     for seminar_html in seminar_section.find_all("li"):
         link = seminar_html.find("a", class_="seminars__link")["href"]
         if link is None:
             print(html)
             continue
+        links.append(link)
+    return links
+
+
+def parse_seminars(seminar_requests, parser=DEFAULT_PARSER):
+    seminars = []
+    for link, request in seminar_requests:
         print(f"    * {link}", file=sys.stderr, end='')
-        response = session.get(link,headers={"Accept-Encoding": "gzip, deflate, br"})
-        print(cache_info(response), file=sys.stderr)
-        seminar = parse_seminar(BeautifulSoup(response.text, features="lxml"))
+        response = request.result()
+        profiling.record_response("expand_program", response)
+        print(cache_info(link, response), file=sys.stderr)
+        seminar = parse_seminar(parse_html(response.text, SEMINAR_PAGE, parser))
         seminar.update( {
             "link": link,
             "category": "IML Seminar",
         } )
         days = (seminar["dates"][0] - datetime.date.today()).days
         if( days < 0 ):
-            set_expire( response, forever=True )
+            set_expire( link, response, forever=True )
         elif( days <= 14 ):
-            set_expire( response, hours=1 )
+            set_expire( link, response, hours=1 )
         else:
-            set_expire( response, days=days-14 )
+            set_expire( link, response, days=days-14 )
         seminars.append(seminar)
     return seminars
 
@@ -223,7 +431,8 @@ def parse_other_fields(html):
         stripped_strings = [s for s in stripped_strings if s]
         key, *rest = stripped_strings
         value = "".join(rest).lstrip(":").strip()
-        ret[key.rstrip(":")] = value
+        # Headers repeat in every seminar
+        ret[smc_scraper.shared(key.rstrip(":"))] = value
     return ret
 
 ######################################################################
@@ -251,10 +460,27 @@ def print_field(header, value):
         print(f"{header.title()}: {value}")
 
 def match_str(str1,str2):
-    return (str1 or "").strip() == (str2 or "").strip()
+    return normalize(str1) == normalize(str2)
+
+def normalize(string):
+    return (string or "").strip()
+
+def title_tokens(title):
+    return frozenset(TOKEN_RE.findall(normalize(title).lower()))
+
+def similarity(tokens1, tokens2):
+    if not tokens1 or not tokens2:
+        return 0
+    common = len(tokens1 & tokens2)
+    return common / (len(tokens1) + len(tokens2) - common)
 
-def matches(in_calendar, entry):
-    matches_title = match_str(entry["title"], in_calendar.title)
+def match_title_fuzzy(str1, str2):
+    return match_str(str1, str2) or (
+        similarity(title_tokens(str1), title_tokens(str2)) >= FUZZY_THRESHOLD
+    )
+
+def matches(in_calendar, entry, match_title=match_str):
+    matches_title = match_title(entry["title"], in_calendar.title)
     if isinstance(in_calendar, smc_scraper.Event):
         matches_speaker = True
         matches_dates = entry["dates"] == (in_calendar.start_day,
@@ -277,22 +503,139 @@ def matches(in_calendar, entry):
     return matches_title and matches_speaker and matches_dates and matches_time
 
 
-if __name__ == "__main__":
-    print("Fetching SMC site (for comparison).", file=sys.stderr)
-    calendar = smc_scraper.scrape(
-        start=datetime.date.today(),
-        stop_seminars=datetime.date.today() + datetime.timedelta(days=14),
-        stop_events=datetime.date.today() + datetime.timedelta(days=14),
-        lang="en",
-        max_events=None,
+class CalendarIndex:
+    """
+    Index of the SMC calendar (as returned by smc_scraper.scrape) for matching
+    IML entries.
+
+    matches() can only succeed or print a diagnostic for calendar entries with
+    the same title, seminars on the same day with the same speaker, or events
+    with the same dates. find() only calls matches() for those, in calendar
+    order, and thus gives the same result and diagnostics as trying every
+    calendar entry. In fuzzy mode, titles match if they have enough words in
+    common; candidates are then found through an index of title words.
+    """
+
+    def __init__(self, calendar, fuzzy=False):
+        self.entries = [in_calendar for section in calendar for in_calendar in section]
+        self.fuzzy = fuzzy
+        self.by_title = defaultdict(list)
+        self.by_day_and_speaker = defaultdict(list)
+        self.by_dates = defaultdict(list)
+        self.by_token = defaultdict(list)
+        self.tokens = []
+        for position, in_calendar in enumerate(self.entries):
+            self.by_title[normalize(in_calendar.title)].append(position)
+            if isinstance(in_calendar, smc_scraper.Seminar):
+                key = (in_calendar.day, normalize(in_calendar.speaker))
+                self.by_day_and_speaker[key].append(position)
+            else:
+                key = (in_calendar.start_day, in_calendar.end_day)
+                self.by_dates[key].append(position)
+            if fuzzy:
+                tokens = title_tokens(in_calendar.title)
+                self.tokens.append(tokens)
+                for token in tokens:
+                    self.by_token[token].append(position)
+
+    def candidates(self, entry):
+        positions = set(self.by_title.get(normalize(entry["title"]), ()))
+        start, stop = entry["dates"]
+        if start == stop:
+            key = (start, normalize(entry["speaker"]))
+            positions.update(self.by_day_and_speaker.get(key, ()))
+        positions.update(self.by_dates.get(entry["dates"], ()))
+        if self.fuzzy:
+            tokens = title_tokens(entry["title"])
+            common = Counter(
+                position
+                for token in tokens
+                for position in self.by_token.get(token, ())
+            )
+            positions.update(
+                position
+                for position, count in common.items()
+                if count / (len(tokens) + len(self.tokens[position]) - count)
+                >= FUZZY_THRESHOLD
+            )
+        return [self.entries[position] for position in sorted(positions)]
+
+    def find(self, entry):
+        match_title = match_title_fuzzy if self.fuzzy else match_str
+        return any(
+            matches(in_calendar, entry, match_title)
+            for in_calendar in self.candidates(entry)
+        )
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        help="maximum number of concurrent requests to the IML site",
+        default=MAX_WORKERS,
     )
-    for entry in fetch_entries():
-        print(end="\n" * 3)
-        if "speaker" in entry and any(
-            matches(in_calendar, entry)
-            for calendar_section in calendar
-            for in_calendar in calendar_section
-        ):
-            print(f"'{entry['title']}' matches a calendar entry")
-            continue
-        print_formatted(entry)
+    parser.add_argument(
+        "--parser",
+        choices=PARSERS,
+        help="HTML parser backend",
+        default=DEFAULT_PARSER,
+    )
+    parser.add_argument(
+        "--fuzzy",
+        action="store_true",
+        help="also consider calendar entries with similar titles as matches",
+    )
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument(
+        "--record",
+        help="also write the responses of the SMC and IML sites to DIR, for --replay",
+        metavar="DIR",
+    )
+    recording.add_argument(
+        "--replay",
+        help="read the responses recorded in DIR instead of fetching them, as on the day of the recording",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--profile",
+        help="write the time spent in each stage, bytes downloaded and cache hits as JSON",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--cprofile",
+        help="write cProfile statistics (view with python -m pstats)",
+        metavar="FILE",
+    )
+    return parser
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    transport.configure(record=args.record, replay=args.replay)
+    today = transport.today()
+    stop = today + datetime.timedelta(days=14)
+
+    with profiling.profile(args.profile, args.cprofile):
+        print("Fetching SMC site (for comparison).", file=sys.stderr)
+        calendar = smc_scraper.scrape(
+            start=today,
+            stop_seminars=stop,
+            stop_events=stop,
+            lang="en",
+            max_events=None,
+            parser=args.parser,
+        )
+        index = CalendarIndex(calendar, fuzzy=args.fuzzy)
+        entries = fetch_entries(today, stop, max_workers=args.workers, parser=args.parser)
+        for entry in entries:
+            print(end="\n" * 3)
+            if "speaker" in entry and index.find(entry):
+                print(f"'{entry['title']}' matches a calendar entry")
+                continue
+            print_formatted(entry)
+
+
+if __name__ == "__main__":
+    main()
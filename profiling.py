@@ -0,0 +1,154 @@
+"""Instrumentation of the scripts with named spans.
+
+Functions decorated with @spanned(name) (or code in a `with span(name):`
+block) add their wall time and call count to the span `name`, and record()
+adds downloaded bytes and cache hits to it. Nothing is recorded unless
+profiling is enabled, usually through profile() from the --profile option of
+the scripts:
+
+ python semads.py ... --profile profile.json --cprofile profile.pstats
+
+Span times include nested spans, and are summed over threads: the spans of
+concurrent fetches may add up to more than the wall time of the run. Spans
+are only recorded in the process of the script: with semads.py --jobs, the
+parsing in worker processes only appears as the wall time of the
+parse_in_processes span.
+"""
+from __future__ import annotations
+
+import contextlib
+import functools
+import json
+import threading
+import time
+
+_enabled = False
+_lock = threading.Lock()
+_spans = {}
+_counters = {}
+
+
+def enable():
+    global _enabled
+    with _lock:
+        _enabled = True
+        _spans.clear()
+        _counters.clear()
+
+
+def disable():
+    global _enabled
+    _enabled = False
+
+
+def _span_stats(name: str) -> dict:
+    # Call with _lock held
+    stats = _spans.get(name)
+    if stats is None:
+        stats = _spans[name] = {"calls": 0, "seconds": 0.0, "bytes": 0, "cache_hits": 0}
+    return stats
+
+
+@contextlib.contextmanager
+def span(name: str):
+    if not _enabled:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        with _lock:
+            stats = _span_stats(name)
+            stats["calls"] += 1
+            stats["seconds"] += seconds
+
+
+def spanned(name: str):
+    """Decorator recording every call of the function in the span `name`"""
+
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return function(*args, **kwargs)
+            with span(name):
+                return function(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def record(name: str, bytes: int = 0, cache_hit: bool = False):
+    if not _enabled:
+        return
+    with _lock:
+        stats = _span_stats(name)
+        stats["bytes"] += bytes
+        stats["cache_hits"] += bool(cache_hit)
+
+
+def record_response(name: str, response):
+    """Record the size of a requests response, and whether it was cached"""
+    if not _enabled:
+        return
+    record(name, len(response.content), getattr(response, "from_cache", False))
+
+
+def count(name: str, increment: int = 1):
+    if not _enabled:
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + increment
+
+
+def results() -> dict:
+    with _lock:
+        return {
+            "spans": {name: dict(stats) for name, stats in _spans.items()},
+            "counters": dict(_counters),
+        }
+
+
+@contextlib.contextmanager
+def profile(path: str | None, cprofile_path: str | None = None):
+    """
+    Enable profiling for the duration of the block and write the results as
+    JSON to `path`, and cProfile statistics (for pstats) to `cprofile_path`.
+    Does nothing if both are None.
+    """
+    if path is None and cprofile_path is None:
+        yield
+        return
+    # Imported here so that importing this module stays cheap
+    from utility import unescape_html
+
+    profiler = None
+    if cprofile_path is not None:
+        import cProfile
+
+        profiler = cProfile.Profile()
+    enable()
+    unescapes = unescape_html.cache_info()
+    start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    try:
+        yield
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(cprofile_path)
+        seconds = time.perf_counter() - start
+        cache = unescape_html.cache_info()
+        count("unescape_html.cache_hits", cache.hits - unescapes.hits)
+        count("unescape_html.cache_misses", cache.misses - unescapes.misses)
+        disable()
+        if path is not None:
+            data = results()
+            data["seconds"] = seconds
+            with open(path, "w", encoding="utf-8") as file:
+                json.dump(data, file, indent=2)
+                file.write("\n")
@@ -0,0 +1,296 @@
+"""Rendering of digests of the SMC calendar.
+
+Every format is a generator of pieces of the output, written to the output
+file as they are produced, so that the rendered digest is never held in
+memory as a whole:
+
+ text   the plain text email
+ html   an HTML email
+ ics    an iCalendar feed, with one VEVENT per event and seminar
+ jsonl  one JSON object per event and seminar
+"""
+from __future__ import annotations
+
+import datetime
+import html
+import itertools
+import json
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+from smc_scraper import Event, Seminar
+
+INTRO = (
+    "This is an automatically generated summary of the Stockholm Mathematics"
+    " Centre web calendar."
+)
+SUBSCRIBE = "Send subscription requests to kalendarium@math-stockholm.se."
+TIMEZONE = "Europe/Stockholm"
+VTIMEZONE = [
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TIMEZONE}",
+    "BEGIN:DAYLIGHT",
+    "TZOFFSETFROM:+0100",
+    "TZOFFSETTO:+0200",
+    "TZNAME:CEST",
+    "DTSTART:19700329T020000",
+    "RRULE:FREQ=YEARLY;BYMONTH=3;BYDAY=-1SU",
+    "END:DAYLIGHT",
+    "BEGIN:STANDARD",
+    "TZOFFSETFROM:+0200",
+    "TZOFFSETTO:+0100",
+    "TZNAME:CET",
+    "DTSTART:19701025T030000",
+    "RRULE:FREQ=YEARLY;BYMONTH=10;BYDAY=-1SU",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+]
+
+
+class Digest(NamedTuple):
+    start: datetime.date
+    stop_seminars: datetime.date
+    events: Iterable[Event]
+    seminars: Iterable[Seminar]
+
+
+class Format(NamedTuple):
+    render: Callable[[Digest], Iterator[str]]
+    extension: str
+    # newline argument of open(): iCalendar lines end with CRLF everywhere
+    newline: str | None = None
+
+
+def group_by_day(seminars: Iterable[Seminar]):
+    """Seminars grouped by day, in order of days (and calendar order within)"""
+    return itertools.groupby(
+        sorted(seminars, key=lambda seminar: seminar.day),
+        key=lambda seminar: seminar.day,
+    )
+
+
+def format_date_email(day):
+    return f"{day:%B} {day.day:d}, {day:%Y}"
+
+
+def format_day_heading(day):
+    return f"{f'{day:%A}'.upper()}, {day:%B} {day.day:d}, {day:%Y}"
+
+
+def format_times(seminar: Seminar) -> str | None:
+    if not (seminar.start_time or seminar.end_time):
+        return None
+    start_time = (
+        seminar.start_time.strftime("%H:%M") if seminar.start_time is not None else ""
+    )
+    end_time = seminar.end_time.strftime("%H:%M") if seminar.end_time is not None else ""
+    return f"{start_time:>5} - {end_time:>5}"
+
+
+######################################################################
+# Plain text
+######################################################################
+
+
+def text(digest: Digest) -> Iterator[str]:
+    yield f"{INTRO}\n\n{SUBSCRIBE}\n\n"
+    events = iter(digest.events)
+    first = next(events, None)
+    if first is not None:
+        yield "EVENTS\n======\n\n"
+        for event in itertools.chain([first], events):
+            yield event.format() + "\n\n"
+        yield "\n\n"
+    yield (
+        "SEMINARS\n========\n\n"
+        f"Seminars from {format_date_email(digest.start)},"
+        f" to {format_date_email(digest.stop_seminars)}.\n\n"
+    )
+    for day, seminars in group_by_day(digest.seminars):
+        yield f"\n{format_day_heading(day)}"
+        for seminar in seminars:
+            yield f"\n\n{seminar.format()}"
+        yield "\n\n"
+
+
+######################################################################
+# HTML
+######################################################################
+
+
+def link(url: str) -> str:
+    url = html.escape(url)
+    return f'<a href="{url}">{url}</a>'
+
+
+def html_email(digest: Digest) -> Iterator[str]:
+    escape = html.escape
+    yield (
+        '<!DOCTYPE html>\n<html lang="en">\n<head><meta charset="utf-8">'
+        f"<title>Seminars from {format_date_email(digest.start)}</title></head>\n"
+        f"<body>\n<p>{escape(INTRO)}</p>\n<p>{escape(SUBSCRIBE)}</p>\n"
+    )
+    events = iter(digest.events)
+    first = next(events, None)
+    if first is not None:
+        yield "<h2>Events</h2>\n<ul>\n"
+        for event in itertools.chain([first], events):
+            dates = Event.format_date_range(event.start_day, event.end_day)
+            yield f"<li><strong>{escape(dates)}</strong>, {escape(event.description())}"
+            if event.location is not None:
+                yield f"<br>{escape(event.location)}"
+            yield f"<br>{link(event.calendar_url)}</li>\n"
+        yield "</ul>\n"
+    yield (
+        "<h2>Seminars</h2>\n"
+        f"<p>Seminars from {format_date_email(digest.start)},"
+        f" to {format_date_email(digest.stop_seminars)}.</p>\n"
+    )
+    for day, seminars in group_by_day(digest.seminars):
+        yield f"<h3>{escape(format_day_heading(day))}</h3>\n"
+        for seminar in seminars:
+            lines = []
+            times = format_times(seminar)
+            if times is not None:
+                lines.append(escape(times.strip()))
+            if seminar.speaker:
+                lines.append(escape(seminar.speaker))
+            if seminar.title:
+                lines.append(f"<strong>{escape(seminar.title)}</strong>")
+            lines.extend(
+                escape(field) for field in (seminar.location, seminar.series) if field
+            )
+            if seminar.calendar_url:
+                lines.append(link(seminar.calendar_url))
+            yield f"<p>{'<br>'.join(lines)}</p>\n"
+    yield "</body>\n</html>\n"
+
+
+######################################################################
+# iCalendar (RFC 5545)
+######################################################################
+
+
+def ics_escape(value: str) -> str:
+    return (
+        value.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def ics_line(line: str) -> str:
+    """A content line folded at 75 octets, with CRLF"""
+    encoded = line.encode("utf-8")
+    if len(encoded) <= 75:
+        return line + "\r\n"
+    pieces = []
+    limit = 75
+    while encoded:
+        cut = min(limit, len(encoded))
+        # Do not split UTF-8 sequences
+        while cut < len(encoded) and encoded[cut] & 0xC0 == 0x80:
+            cut -= 1
+        pieces.append(encoded[:cut].decode("utf-8"))
+        encoded = encoded[cut:]
+        limit = 74  # continuation lines start with a space
+    return "\r\n ".join(pieces) + "\r\n"
+
+
+def ics_date_time(day: datetime.date, time: datetime.time) -> str:
+    return f"TZID={TIMEZONE}:{day:%Y%m%d}T{time:%H%M%S}"
+
+
+def ics_event(uid: str, stamp: str, properties: list[str]) -> Iterator[str]:
+    yield ics_line("BEGIN:VEVENT")
+    yield ics_line(f"UID:{ics_escape(uid)}")
+    yield ics_line(f"DTSTAMP:{stamp}")
+    for line in properties:
+        yield ics_line(line)
+    yield ics_line("END:VEVENT")
+
+
+def ics(digest: Digest) -> Iterator[str]:
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+    for line in [
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        "PRODID:-//Stockholm Mathematics Centre//SMC-calendar//EN",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-TIMEZONE:{TIMEZONE}",
+        *VTIMEZONE,
+    ]:
+        yield ics_line(line)
+    for event in digest.events:
+        end_day = (event.end_day or event.start_day) + datetime.timedelta(days=1)
+        properties = [
+            f"DTSTART;VALUE=DATE:{event.start_day:%Y%m%d}",
+            f"DTEND;VALUE=DATE:{end_day:%Y%m%d}",
+            f"SUMMARY:{ics_escape(event.description())}",
+        ]
+        if event.location is not None:
+            properties.append(f"LOCATION:{ics_escape(event.location)}")
+        properties.append(f"URL:{event.calendar_url}")
+        yield from ics_event(
+            f"{event.start_day.isoformat()}/{event.calendar_url}", stamp, properties
+        )
+    for day, seminars in group_by_day(digest.seminars):
+        for seminar in seminars:
+            if seminar.start_time is not None:
+                properties = [f"DTSTART;{ics_date_time(day, seminar.start_time)}"]
+                if seminar.end_time is not None:
+                    properties.append(f"DTEND;{ics_date_time(day, seminar.end_time)}")
+            else:
+                properties = [f"DTSTART;VALUE=DATE:{day:%Y%m%d}"]
+            summary = seminar.title
+            if seminar.speaker:
+                summary = f"{seminar.speaker}: {summary}"
+            properties.append(f"SUMMARY:{ics_escape(summary)}")
+            if seminar.location:
+                properties.append(f"LOCATION:{ics_escape(seminar.location)}")
+            if seminar.series:
+                properties.append(f"CATEGORIES:{ics_escape(seminar.series)}")
+            properties.append(f"URL:{seminar.calendar_url}")
+            yield from ics_event(
+                f"{day.isoformat()}/{seminar.calendar_url}", stamp, properties
+            )
+    yield ics_line("END:VCALENDAR")
+
+
+######################################################################
+# JSON lines
+######################################################################
+
+
+def json_value(value):
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return value
+
+
+def jsonl(digest: Digest) -> Iterator[str]:
+    seminars = itertools.chain.from_iterable(
+        seminars for _, seminars in group_by_day(digest.seminars)
+    )
+    for kind, entries in [("event", digest.events), ("seminar", seminars)]:
+        for entry in entries:
+            fields = {"type": kind}
+            fields.update(
+                (name, json_value(value)) for name, value in entry._asdict().items()
+            )
+            yield json.dumps(fields, ensure_ascii=False) + "\n"
+
+
+FORMATS = {
+    "text": Format(text, ".txt"),
+    "html": Format(html_email, ".html"),
+    "ics": Format(ics, ".ics", newline=""),
+    "jsonl": Format(jsonl, ".jsonl"),
+}
+
+
+def write(path: str, format: str, digest: Digest):
+    """Render `digest` in `format` (a key of FORMATS) to the file `path`"""
+    renderer = FORMATS[format]
+    with open(path, mode="w", encoding="utf-8", newline=renderer.newline) as output:
+        output.writelines(renderer.render(digest))
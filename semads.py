@@ -11,6 +11,17 @@ formats the information as a text file.
  (March 1, 2010) to 20100308 (March 8, 2010), output the generated
  text file in message.txt.
 
+ python semads.py --start 20100301 --weeks 4
+
+ The above run will download the calendar once for the four weeks from
+ March 1, 2010 and write the digest of each week to
+ Archive/seminars2010_W09.txt, ..., Archive/seminars2010_W12.txt.
+
+ python semads.py --start 20100301 --output message.txt --format text html ics
+
+ The above run will also write message.html (an HTML email) and message.ics
+ (an iCalendar feed) from the same calendar entries; see render.py.
+
 # Compatibility
 
  Install required packages using:
@@ -22,21 +33,27 @@ import argparse
 import contextlib
 import datetime
 import locale
-from collections import defaultdict
+import os
 
+import entry_store
+import profiling
+import render
 import smc_scraper
-from smc_scraper import Seminar
+import transport
+from utility import DEFAULT_PARSER, PARSERS
 
 
-for locale_ in [("en_GB", "utf-8"), ("en_US", "utf-8"), "C"]:
-    with contextlib.suppress(locale.Error):
-        locale.setlocale(locale.LC_TIME, locale=locale_)
-        break
-else:
-    print(
-        "Warning: month and day names may be localized incorrectly, consider:\n"
-        "\t`$ sudo locale-gen en_GB.utf8`"
-    )
+def set_time_locale():
+    for locale_ in [("en_GB", "utf-8"), ("en_US", "utf-8"), "C"]:
+        with contextlib.suppress(locale.Error):
+            locale.setlocale(locale.LC_TIME, locale=locale_)
+            break
+    else:
+        print(
+            "Warning: month and day names may be localized incorrectly, consider:\n"
+            "\t`$ sudo locale-gen en_GB.utf8`"
+        )
+
 
 # READ COMMAND-LINE OPTIONS
 
@@ -57,126 +74,285 @@ def parse_date(val):
         return datetime.date.fromisoformat(val)
 
 
-parser = argparse.ArgumentParser()
-parser.add_argument(
-    "--start", type=parse_date, help="start date", metavar="YYYYMMDD", required=True
-)
-parser.add_argument(
-    "--stop-events",
-    type=parse_date,
-    help="stop date for events",
-    metavar="YYYYMMDD",
-)
-parser.add_argument(
-    "--stop-seminars",
-    type=parse_date,
-    help="stop date for seminars",
-    metavar="YYYYMMDD",
-)
-parser.add_argument(
-    "--output",
-    action="store",
-    help="name of destination file of email message",
-    metavar="FILE",
-    required=True,
-)
-parser.add_argument(
-    "--lang",
-    action="store",
-    choices=["en", "sv"],
-    help="language (sv/en)",
-    metavar="en|sv",
-    default="en",
-)
-parser.add_argument(
-    "--max-events",
-    action="store",
-    type=int,
-    help="maximum number of events, not counting ties (events before the seminar stop date are always included)",
-    default=5,
-)
-
-args = parser.parse_args()
-
-if args.stop_events is None:
-    args.stop_events = args.start + datetime.timedelta(days=62)  # 9 weeks, ~2 months
-
-if args.stop_seminars is None:
-    args.stop_seminars = args.start + datetime.timedelta(days=6)
-
-# Argument validation
-
-if args.start > args.stop_events or args.start > args.stop_seminars:
-    raise ValueError("Start date must be before stop date")
-
-
-def scrape_and_format():
-    # + iml_scraper.scrape(args)
-    (events, seminars) = smc_scraper.scrape(
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(
+        "--start", type=parse_date, help="start date", metavar="YYYYMMDD", required=True
+    )
+    parser.add_argument(
+        "--stop-events",
+        type=parse_date,
+        help="stop date for events",
+        metavar="YYYYMMDD",
+    )
+    parser.add_argument(
+        "--stop-seminars",
+        type=parse_date,
+        help="stop date for seminars",
+        metavar="YYYYMMDD",
+    )
+    parser.add_argument(
+        "--output",
+        action="store",
+        help="name of destination file of email message (unless --weeks is given)",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--format",
+        action="store",
+        nargs="+",
+        choices=render.FORMATS,
+        help="formats of the digest, rendered from the same entries: the first one is written to the output file, the others next to it with the extension of the format (.txt, .html, .ics, .jsonl)",
+        metavar="text|html|ics|jsonl",
+        default=["text"],
+    )
+    parser.add_argument(
+        "--weeks",
+        action="store",
+        type=int,
+        help="write the digests of this many consecutive weeks from the start date, fetching the calendar once, to ARCHIVE_DIR/seminarsYYYY_Www.txt",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--archive-dir",
+        action="store",
+        help="directory of the digests written with --weeks (default: Archive)",
+        metavar="ARCHIVE_DIR",
+        default="Archive",
+    )
+    parser.add_argument(
+        "--lang",
+        action="store",
+        choices=["en", "sv", "both"],
+        help="language (sv/en), or both: the English and Swedish calendars are fetched concurrently, the Swedish digest is written next to the English one with _sv before the extension, and entries missing in one calendar are taken from the other",
+        metavar="en|sv|both",
+        default="en",
+    )
+    parser.add_argument(
+        "--max-events",
+        action="store",
+        type=int,
+        help="maximum number of events, not counting ties (events before the seminar stop date are always included)",
+        default=5,
+    )
+    parser.add_argument(
+        "--parser",
+        action="store",
+        choices=PARSERS,
+        help="HTML parser backend (lxml only builds the calendar entries, bs4 the whole page)",
+        default=DEFAULT_PARSER,
+    )
+    parser.add_argument(
+        "--window",
+        action="store",
+        type=int,
+        help="fetch the calendar concurrently in windows of this many days (default: one request)",
+        metavar="DAYS",
+    )
+    parser.add_argument(
+        "--workers",
+        action="store",
+        type=int,
+        help="maximum number of concurrent requests",
+        default=smc_scraper.MAX_WORKERS,
+    )
+    parser.add_argument(
+        "--jobs",
+        action="store",
+        type=int,
+        help="parse the calendar entries in this many processes (split from the page by lxml, whatever --parser; not with --store; --profile does not include their spans)",
+        metavar="N",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not use or update the on-disk cache of calendar pages",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="download the calendar again even if it is cached",
+    )
+    parser.add_argument(
+        "--cache-ttl",
+        action="store",
+        type=int,
+        help="minutes to reuse a cached calendar page when the server does not support revalidation",
+        metavar="MINUTES",
+        default=int(smc_scraper.CACHE_TTL.total_seconds() // 60),
+    )
+    parser.add_argument(
+        "--store",
+        action="store",
+        nargs="?",
+        const=entry_store.STORE_NAME,
+        help=f"keep parsed calendar entries in an SQLite database and report changes since the previous run (default: {entry_store.STORE_NAME})",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--max-age",
+        action="store",
+        type=int,
+        help="use the stored entries without fetching the calendar if the range was fetched within this many minutes (requires --store)",
+        metavar="MINUTES",
+    )
+    recording = parser.add_mutually_exclusive_group()
+    recording.add_argument(
+        "--record",
+        action="store",
+        help="also write the responses of the calendar to DIR, for --replay",
+        metavar="DIR",
+    )
+    recording.add_argument(
+        "--replay",
+        action="store",
+        help="read the responses recorded in DIR instead of fetching the calendar",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store",
+        help="write the time spent in each stage, bytes downloaded and cache hits as JSON",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store",
+        help="write cProfile statistics (view with python -m pstats)",
+        metavar="FILE",
+    )
+    return parser
+
+
+def scrape_options(args):
+    """Set up the cache and return the keyword arguments for the scraper"""
+    smc_scraper.configure_cache(
+        enabled=not args.no_cache,
+        refresh=args.refresh,
+        ttl=datetime.timedelta(minutes=args.cache_ttl),
+    )
+    return dict(
         start=args.start,
         stop_events=args.stop_events,
         stop_seminars=args.stop_seminars,
         lang=args.lang,
         max_events=args.max_events,
+        parser=args.parser,
+        window=args.window,
+        max_workers=args.workers,
+        jobs=args.jobs,
+        max_age=datetime.timedelta(minutes=args.max_age)
+        if args.max_age is not None
+        else None,
     )
-    seminars_by_day = expand_and_group_by_day(seminars)
 
-    formatted_start = format_date_email(args.start)
-    formatted_stop = format_date_email(args.stop_seminars)
 
-    body = "\n".join(
-        [
-            "This is an automatically generated summary of the Stockholm Mathematics Centre web calendar.",
-            "",
-            "Send subscription requests to kalendarium@math-stockholm.se.",
-            "",
-            "",
+def scrape_digests(args) -> list[tuple[str, render.Digest]]:
+    """
+    The digest to write, or with --weeks the digest of every week, with the
+    suffix of its file name: "_sv" for the Swedish digests of --lang both
+    """
+    options = scrape_options(args)
+    store = entry_store.EntryStore(args.store) if args.store is not None else None
+    seminar_days = args.stop_seminars - args.start
+    if args.lang == "both":
+        del options["lang"]
+        languages = smc_scraper.scrape_languages(
+            **options,
+            langs=smc_scraper.LANGUAGES,
+            weeks=args.weeks or 1,
+            store=store,
+        )
+        digests = [
+            (
+                "" if lang == "en" else f"_{lang}",
+                render.Digest(start, start + seminar_days, events, seminars),
+            )
+            for lang, weeks in languages.items()
+            for start, events, seminars in weeks
         ]
-    )
-    if events:
-        body += "\n".join(["EVENTS", "======", "", ""])
-        for event in events:
-            body += event.format() + "\n\n"
-        body += "\n\n"
-
-    body += "\n".join(
-        [
-            "SEMINARS",
-            "========",
-            "",
-            f"Seminars from {formatted_start}, to {formatted_stop}.",
-            "",
-            "",
+    elif args.weeks is None:
+        # + iml_scraper.scrape(args)
+        (events, seminars) = smc_scraper.scrape(**options, store=store)
+        digests = [
+            ("", render.Digest(args.start, args.stop_seminars, events, seminars))
         ]
-    )
+    else:
+        digests = [
+            ("", render.Digest(start, start + seminar_days, events, seminars))
+            for start, events, seminars in smc_scraper.scrape_weeks(
+                **options, weeks=args.weeks, store=store
+            )
+        ]
+    if store is not None:
+        store.close()
+    return digests
 
-    body += "".join(
-        format_day(day, seminar_list)
-        for day, seminar_list in seminars_by_day
-        if seminar_list
-    )
-    return body
 
+@profiling.spanned("scrape_and_format")
+def scrape_and_format(args):
+    for suffix, digest in scrape_digests(args):
+        if args.weeks is None:
+            path = args.output
+        else:
+            path = os.path.join(
+                args.archive_dir,
+                archive_name(digest.start, render.FORMATS[args.format[0]].extension),
+            )
+        base, extension = os.path.splitext(path)
+        base += suffix
+        for index, format in enumerate(args.format):
+            if index > 0:
+                extension = render.FORMATS[format].extension
+            path = base + extension
+            if args.weeks is not None or index > 0 or suffix:
+                print(f"Writing {path}")
+            render.write(path, format, digest)
+
+
+def archive_name(start, extension=".txt"):
+    """The name calendar.sh gives the digest of the week from start"""
+    return f"seminars{start.year}_W{start.isocalendar()[1]:02d}{extension}"
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+
+    if args.stop_events is None:
+        args.stop_events = args.start + datetime.timedelta(days=62)  # 9 weeks, ~2 months
+
+    if args.stop_seminars is None:
+        args.stop_seminars = args.start + datetime.timedelta(days=6)
+
+    # Argument validation
+
+    if args.start > args.stop_events or args.start > args.stop_seminars:
+        raise ValueError("Start date must be before stop date")
+
+    if args.max_age is not None and args.store is None:
+        raise ValueError("--max-age requires --store")
+
+    if args.jobs is not None and args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
 
-def expand_and_group_by_day(seminars):
-    seminars_by_day = defaultdict(list)
-    for seminar in seminars:
-        seminars_by_day[seminar.day].append(seminar)
-    return sorted(seminars_by_day.items())
+    if args.jobs is not None and args.store is not None:
+        raise ValueError("--jobs cannot be combined with --store")
 
+    if args.weeks is not None and args.weeks < 1:
+        raise ValueError("--weeks must be at least 1")
 
-def format_day(day, seminar_list: list[Seminar]):
-    pieces = [f"{f'{day:%A}'.upper()}, {day:%B} {day.day:d}, {day:%Y}"]
-    pieces.extend(seminar.format() for seminar in seminar_list)
-    text = "\n\n".join(pieces)
-    return f"\n{text}\n\n"
+    if (args.output is None) == (args.weeks is None):
+        raise ValueError("Exactly one of --output and --weeks is required")
 
+    set_time_locale()
+    transport.configure(record=args.record, replay=args.replay)
 
-def format_date_email(day):
-    return f"{day:%B} {day.day:d}, {day:%Y}"
+    # OPEN OUTPUT FILE AND OUTPUT SEMINARS
+    with profiling.profile(args.profile, args.cprofile):
+        if args.weeks is not None:
+            os.makedirs(args.archive_dir, exist_ok=True)
+        scrape_and_format(args)
 
 
-# OPEN OUTPUT FILE AND OUTPUT SEMINARS
-mail_body = scrape_and_format()
-with open(args.output, mode="w", encoding="utf-8") as output:
-    output.write(mail_body)
+if __name__ == "__main__":
+    main()
@@ -15,15 +15,20 @@
 # logging in as boij to smtp.kth.se
 
 import argparse
+import email.policy
 import getpass
+import itertools
 import re
 import smtplib
-import time
 from email.header import Header
 from email.mime.text import MIMEText
 from email.utils import formatdate
 from datetime import date
 
+import profiling
+import smtp_delivery
+from smtp_delivery import Envelope
+
 # reasonable emails should have an @, at least one . afterwards, and no whitespace.
 # the list is curated by hand anyway so should not be a problem
 EMAIL_REGEX = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
@@ -31,6 +36,15 @@ EMAIL_REGEX = re.compile(r"[^@\s]+@[^@\s]+\.[^@\s]+")
 SEND_AS = "kalendarium@math-stockholm.se"
 # SEND_AS = "kalendarium@math.kth.se"
 
+SMTP_HOST = "smtp.kth.se"
+SMTP_PORT = 587
+
+# To header of messages sent to several recipients at once
+UNDISCLOSED_RECIPIENTS = "undisclosed-recipients:;"
+# The headers are built as email.header.Header objects, which only the compat32
+# policy knows how to fold
+MESSAGE_POLICY = email.policy.compat32.clone(linesep="\r\n")
+
 
 def parse_emails(file):
     with open(file) as file:
@@ -66,34 +80,81 @@ def read_file(file):
 
 
 # READ COMMAND-LINE OPTIONS
-parser = argparse.ArgumentParser()
-
-parser.add_argument(
-    "--sendlist",
-    type=parse_emails,
-    help="file with list of email addresses",
-    metavar="EMAILS_FILE",
-    required=True,
-)
-parser.add_argument(
-    "--message",
-    type=read_file,
-    help="file with message body",
-    metavar="MESSAGE_FILE",
-    required=True,
-)
-parser.add_argument("--subject", type=str, help="subject line", default="Seminars")
-parser.add_argument(
-    "--username", type=str, help="KTH username of sender", required=True
-)
-
-# parser.add_option("--ssl", action="store_true", dest="ssl",
-#                  help="connect via SSL")
-# parser.add_option("--socks", action="store_true", dest="socks",
-#                  help="Use SOCKS proxy")
-# parser.set_defaults(ssl=False)
-
-args = parser.parse_args()
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(
+        "--sendlist",
+        type=parse_emails,
+        help="file with list of email addresses",
+        metavar="EMAILS_FILE",
+        required=True,
+    )
+    parser.add_argument(
+        "--message",
+        type=read_file,
+        help="file with message body",
+        metavar="MESSAGE_FILE",
+        required=True,
+    )
+    parser.add_argument("--subject", type=str, help="subject line", default="Seminars")
+    parser.add_argument(
+        "--username", type=str, help="KTH username of sender", required=True
+    )
+    parser.add_argument(
+        "--connections",
+        type=int,
+        help="number of simultaneous SMTP connections",
+        default=1,
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        help="maximum number of messages (SMTP transactions) per second (0 for no limit)",
+        default=3.0,
+    )
+    parser.add_argument(
+        "--batch-size",
+        type=int,
+        help="send each message to up to this many recipients at once, with undisclosed recipients",
+    )
+    parser.add_argument(
+        "--batch-by-domain",
+        action="store_true",
+        help=f"send each message to the recipients of one domain at once (at most --batch-size, default {smtp_delivery.MAX_BATCH}), with undisclosed recipients",
+    )
+    parser.add_argument(
+        "--retries",
+        type=int,
+        help="number of times to retry a message after a transient error before its data is sent (a message whose connection fails later is reported as possibly sent)",
+        default=smtp_delivery.RETRIES,
+    )
+    parser.add_argument("--smtp-host", type=str, help="SMTP server", default=SMTP_HOST)
+    parser.add_argument("--smtp-port", type=int, help="SMTP port", default=SMTP_PORT)
+    parser.add_argument(
+        "--no-tls",
+        action="store_true",
+        help="do not use STARTTLS (only for testing against a local server)",
+    )
+    parser.add_argument(
+        "--profile",
+        help="write the time spent sending, bytes sent and delivery counts as JSON",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--cprofile",
+        help="write cProfile statistics (view with python -m pstats)",
+        metavar="FILE",
+    )
+
+    # parser.add_option("--ssl", action="store_true", dest="ssl",
+    #                  help="connect via SSL")
+    # parser.add_option("--socks", action="store_true", dest="socks",
+    #                  help="Use SOCKS proxy")
+    # parser.set_defaults(ssl=False)
+
+    return parser
 
 
 # SETUP PROXY IF REQUESTED
@@ -108,37 +169,103 @@ args = parser.parse_args()
 
 # SEND EMAILS
 
-with smtplib.SMTP("smtp.kth.se", 587) as server:
-    server.starttls()
+
+def connect(args, password):
+    server = smtplib.SMTP(args.smtp_host, args.smtp_port)
+    try:
+        if not args.no_tls:
+            server.starttls()
+        server.login(args.username, password)
+    except BaseException:
+        server.close()
+        raise
+    return server
+
+
+def ask_password(args):
     password_prompt = f"{args.username}@kth.se's password:"
     while True:
         try:
             password = getpass.getpass(password_prompt)
-            server.login(args.username, password)
-            break
+            smtp_delivery.close(connect(args, password))
+            return password
         except smtplib.SMTPAuthenticationError:
             password_prompt = (
                 f"Login unsuccessful, reenter {args.username}@kth.se's password:"
             )
         except smtplib.SMTPException as e:
-            print("Unable to login to smtp.kth.se")
+            print(f"Unable to login to {args.smtp_host}")
             raise e
 
-    for index, receiver in enumerate(args.sendlist, start=1):
-        # m = Message()
-        m = MIMEText(args.message, _charset="utf-8")
+
+def build_message(args, receiver=None):
+    # m = Message()
+    m = MIMEText(args.message, _charset="utf-8")
+    if receiver is not None:
         m["To"] = receiver
-        m["From"] = SEND_AS
-        m["Subject"] = Header(args.subject, charset="utf-8")
-        m["Date"] = formatdate(localtime=True)
+    m["From"] = SEND_AS
+    m["Subject"] = Header(args.subject, charset="utf-8")
+    m["Date"] = formatdate(localtime=True)
 
-        # m.set_payload(body)
-        # m.set_charset('utf-8')
+    # m.set_payload(body)
+    # m.set_charset('utf-8')
+    return m.as_bytes(policy=MESSAGE_POLICY)
 
-        try:
-            server.sendmail(SEND_AS, [receiver], m.as_string())
-            print(f"Sent to {receiver} ({index}/{len(args.sendlist)})")
-        except Exception as e:
-            print(f"Error sending to {receiver}")
-            print(e)
-        time.sleep(0.3)
+
+def address_message(message, receiver):
+    """Add a To header to a message built without one"""
+    return MESSAGE_POLICY.fold("To", receiver).encode() + message
+
+
+def build_envelopes(args):
+    # The message is built and encoded once, and either sent to batches of
+    # recipients at once or given a To header for each recipient.
+    if args.batch_size is not None or args.batch_by_domain:
+        message = build_message(args, UNDISCLOSED_RECIPIENTS)
+        return (
+            Envelope(SEND_AS, batch, message)
+            for batch in smtp_delivery.batches(
+                args.sendlist, args.batch_size, args.batch_by_domain
+            )
+        )
+    message = build_message(args)
+    return (
+        Envelope(SEND_AS, [receiver], address_message(message, receiver))
+        for receiver in args.sendlist
+    )
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+    password = ask_password(args)
+    counter = itertools.count(1)
+
+    def report(status):
+        if status.ok:
+            profiling.count("delivered")
+            print(f"Sent to {status.recipient} ({next(counter)}/{len(args.sendlist)})")
+        elif status.uncertain:
+            profiling.count("possibly delivered")
+            print(
+                f"Possibly sent to {status.recipient} ({next(counter)}/{len(args.sendlist)})"
+            )
+            print(status.detail)
+        else:
+            profiling.count("failed")
+            next(counter)
+            print(f"Error sending to {status.recipient}")
+            print(status.detail)
+
+    with profiling.profile(args.profile, args.cprofile), profiling.span("deliver"):
+        smtp_delivery.deliver(
+            build_envelopes(args),
+            connect=lambda: connect(args, password),
+            connections=args.connections,
+            rate=args.rate,
+            retries=args.retries,
+            report=report,
+        )
+
+
+if __name__ == "__main__":
+    main()
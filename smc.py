@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+"""Command line entry point to the SMC calendar scripts.
+
+# Usage
+ python smc.py digest --start 20100301 --output message.txt
+ python smc.py iml
+ python smc.py send --message message.txt --sendlist emails.txt --username boij
+ python smc.py send --help
+ python smc.py archive --start 20200101 --stop 20231231
+ python smc.py watch --interval 30
+ python smc.py tex abstract.tex > abstract.html
+
+Only the module of the chosen subcommand is imported, and the heavy
+dependencies (requests, BeautifulSoup, lxml) only once they are used, so
+that --help and invalid arguments are reported quickly.
+"""
+import argparse
+import importlib
+
+# subcommand: (module with main(argv, prog), description)
+COMMANDS = {
+    "digest": ("semads", "generate the weekly digest of the SMC calendar"),
+    "iml": ("iml_scraper", "list Mittag-Leffler entries missing in the SMC calendar"),
+    "send": ("seminarmailer", "send the digest email"),
+    "archive": ("smc_archive", "archive the SMC calendar over years and query it"),
+    "watch": ("digest_watch", "keep the digest of the coming week ready"),
+    "tex": ("tex2polopoly", "convert simple TeX code to Polopoly HTML source"),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Scripts for the SMC calendar digest.",
+        epilog="Run %(prog)s COMMAND --help for the options of a command.",
+    )
+    parser.add_argument(
+        "command",
+        choices=COMMANDS,
+        help="; ".join(f"{name}: {help}" for name, (_, help) in COMMANDS.items()),
+    )
+    parser.add_argument("args", nargs=argparse.REMAINDER, help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    module, _ = COMMANDS[args.command]
+    importlib.import_module(module).main(
+        args.args, prog=f"{parser.prog} {args.command}"
+    )
+
+
+if __name__ == "__main__":
+    main()
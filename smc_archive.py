@@ -0,0 +1,201 @@
+#!/usr/bin/env python3
+"""Archive of the SMC calendar over long ranges (years), for reports.
+
+# Usage
+ python smc_archive.py --start 20200101 --stop 20231231
+ python smc_archive.py --start 20220101 --stop 20221231 --no-fetch --series-counts
+ python smc_archive.py --start 20220101 --stop 20221231 --no-fetch \\
+     --series "Analysis Seminar" --output analysis2022.tsv
+
+ The first run fetches the calendar from January 1, 2020 to December 31, 2023
+ in windows of --window days and stores the parsed entries in
+ smc_archive.sqlite (an entry_store.EntryStore) window by window, so that
+ memory does not grow with the range. Windows stored by a previous run are
+ skipped: run the same command again to resume an interrupted run, or with
+ --refresh to fetch everything again.
+
+ The other runs only query the archive: the number of entries of each series
+ in 2022, and the entries of the Analysis Seminar in 2022 as tab-separated
+ values (start, end, series, speaker, title, location, URL).
+"""
+import argparse
+import sys
+
+import entry_store
+import profiling
+import smc_scraper
+from semads import parse_date
+from smc_scraper import Event
+from utility import DEFAULT_PARSER, PARSERS
+
+ARCHIVE_NAME = "smc_archive.sqlite"
+# Days per request: a month of calendar entries is a page of moderate size
+WINDOW = 28
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(
+        "--start", type=parse_date, help="start date", metavar="YYYYMMDD", required=True
+    )
+    parser.add_argument(
+        "--stop", type=parse_date, help="stop date", metavar="YYYYMMDD", required=True
+    )
+    parser.add_argument(
+        "--lang",
+        action="store",
+        choices=["en", "sv"],
+        help="language (sv/en)",
+        metavar="en|sv",
+        default="en",
+    )
+    parser.add_argument(
+        "--archive",
+        action="store",
+        help=f"SQLite database of the archived entries (default: {ARCHIVE_NAME})",
+        metavar="FILE",
+        default=ARCHIVE_NAME,
+    )
+    parser.add_argument(
+        "--window",
+        action="store",
+        type=int,
+        help=f"fetch the calendar in windows of this many days (default: {WINDOW})",
+        metavar="DAYS",
+        default=WINDOW,
+    )
+    parser.add_argument(
+        "--workers",
+        action="store",
+        type=int,
+        help="maximum number of concurrent requests (and of pages held in memory)",
+        default=smc_scraper.MAX_WORKERS,
+    )
+    parser.add_argument(
+        "--parser",
+        action="store",
+        choices=PARSERS,
+        help="HTML parser backend (lxml only builds the calendar entries, bs4 the whole page)",
+        default=DEFAULT_PARSER,
+    )
+    parser.add_argument(
+        "--no-fetch",
+        action="store_true",
+        help="only query the archive",
+    )
+    parser.add_argument(
+        "--refresh",
+        action="store_true",
+        help="fetch the windows already in the archive again",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="do not use or update the on-disk cache of calendar pages",
+    )
+    parser.add_argument(
+        "--list",
+        action="store_true",
+        help="write the archived entries from start to stop as tab-separated values",
+    )
+    parser.add_argument(
+        "--series",
+        action="store",
+        help="only list the entries of this series (implies --list)",
+    )
+    parser.add_argument(
+        "--series-counts",
+        action="store_true",
+        help="print the number of archived entries of each series from start to stop",
+    )
+    parser.add_argument(
+        "--output",
+        action="store",
+        help="file to write the list to (default: standard output)",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store",
+        help="write the time spent in each stage, bytes downloaded and cache hits as JSON",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--cprofile",
+        action="store",
+        help="write cProfile statistics (view with python -m pstats)",
+        metavar="FILE",
+    )
+    return parser
+
+
+def format_row(entry) -> str:
+    if isinstance(entry, Event):
+        start = entry.start_day.isoformat()
+        end = entry.end_day.isoformat() if entry.end_day is not None else ""
+        speaker = ""
+    else:
+        start = end = entry.day.isoformat()
+        if entry.start_time is not None:
+            start += f" {entry.start_time:%H:%M}"
+        end = f"{end} {entry.end_time:%H:%M}" if entry.end_time is not None else ""
+        speaker = entry.speaker or ""
+    fields = [
+        start,
+        end,
+        entry.series,
+        speaker,
+        entry.title,
+        entry.location or "",
+        entry.calendar_url,
+    ]
+    # Tabs and newlines would break the columns
+    return "\t".join(" ".join(field.split()) for field in fields) + "\n"
+
+
+def write_list(store, args, output):
+    for entry in store.iter_entries(args.lang, args.start, args.stop, args.series):
+        output.write(format_row(entry))
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+
+    if args.start > args.stop:
+        raise ValueError("Start date must be before stop date")
+
+    if args.window < 1:
+        raise ValueError("--window must be at least 1")
+
+    if args.series is not None:
+        args.list = True
+
+    with profiling.profile(args.profile, args.cprofile), entry_store.EntryStore(
+        args.archive
+    ) as store:
+        if not args.no_fetch:
+            smc_scraper.configure_cache(enabled=not args.no_cache, refresh=args.refresh)
+            with profiling.span("archive"):
+                fetched = smc_scraper.archive_entries(
+                    args.start,
+                    args.stop,
+                    args.lang,
+                    store,
+                    args.window,
+                    parser=args.parser,
+                    max_workers=args.workers,
+                )
+            print(f"Fetched {fetched} windows into {args.archive}")
+        if args.series_counts:
+            for series, count in store.series_counts(args.lang, args.start, args.stop):
+                print(f"{count:7d}  {series}")
+        if args.list:
+            if args.output is None:
+                write_list(store, args, sys.stdout)
+            else:
+                with open(args.output, mode="w", encoding="utf-8") as output:
+                    write_list(store, args, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,27 @@
 from __future__ import annotations
 
-from typing import NamedTuple
+import concurrent.futures
 import contextlib
 import datetime
+import io
+import itertools
 import re
-from urllib.request import urlopen
+import sys
+import threading
+from collections import Counter, defaultdict, deque
 
-from bs4 import BeautifulSoup
 from datetime import date, time
 
-from utility import unescape_html
+import profiling
+import transport
+from utility import (
+    DEFAULT_PARSER,
+    cache_info,
+    parse_html,
+    select_html,
+    unescape_html,
+    xpath_class,
+)
 
 ALTERNATE_SPEAKER_TAGS = ["Lecturer", "Doctoral student", "Respondent", "Participating"]
 EVENT_SERIES = [
@@ -18,34 +30,162 @@ EVENT_SERIES = [
     "Göran Gustafsson Lectures in mathematics",
 ]
 INDENT = " " * 7
+SMC_URL = "https://www.math-stockholm.se"
 CONFERENCE_LIKE_WORDS = ["Conference", "Workshop"]
+# Number of concurrent requests when fetching the calendar in windows
+MAX_WORKERS = 4
+CALENDAR_ENTRIES = f"//li[{xpath_class('calendar__event')}]"
+LANGUAGES = ["en", "sv"]
+# Polopoly content ID at the end of the path of calendar URLs, e.g.
+# /en/kalender/seminar-1.1234567 and /kalender/seminarium-1.1234567
+CALENDAR_ID_RE = re.compile(r"-(\d+\.\d+)$")
+WEEK = datetime.timedelta(days=7)
+# Chunks of calendar entries per parsing process with --jobs, to even out the
+# load between the processes
+CHUNKS_PER_JOB = 4
 
+# Calendar pages are cached on disk (if requests_cache is installed). A cached
+# page is revalidated with the server if the response had an ETag or
+# Last-Modified header, and otherwise reused for CACHE_TTL.
+CACHE_NAME = "smc_cache"
+CACHE_TTL = datetime.timedelta(hours=1)
+
+_session = None
+_lock = threading.Lock()
+_refresh = False
+
+
+def shared(value: str | None) -> str | None:
+    """
+    `value` interned, so that strings repeated in many entries (series,
+    rooms, sites, headers) are only stored once. Only for fields with few
+    distinct values: speakers, titles and dates are kept as they are.
+    """
+    if value is None:
+        return None
+    return sys.intern(value)
+
+
+def split_url(url: str) -> tuple[str, str]:
+    """The scheme and host of `url` (shared between entries), and the rest"""
+    host = url.find("://")
+    if host < 0:
+        return "", url
+    path = url.find("/", host + 3)
+    if path < 0:
+        path = len(url)
+    return shared(url[:path]), url[path:]
+
+
+class Record:
+    """
+    Base of the calendar entries: immutable objects with __slots__ which
+    behave like the NamedTuples they replaced, with _fields, _asdict(),
+    _replace(), iteration, equality, hashing and pickling by field values.
+    The calendar URL is stored as the site (shared) and the path.
+    """
+
+    __slots__ = ("_site", "_path")
+    _fields: tuple[str, ...] = ()
+
+    def _init(self, calendar_url: str, **fields):
+        for name, value in fields.items():
+            object.__setattr__(self, name, value)
+        site, path = split_url(calendar_url)
+        object.__setattr__(self, "_site", site)
+        object.__setattr__(self, "_path", path)
+
+    @property
+    def calendar_url(self) -> str:
+        return self._site + self._path
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"can't set attribute '{name}'")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"can't delete attribute '{name}'")
+
+    def __iter__(self):
+        return (getattr(self, name) for name in self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return tuple(self) == tuple(other)
+
+    def __hash__(self):
+        return hash(tuple(self))
+
+    def __repr__(self):
+        fields = ", ".join(
+            f"{name}={value!r}" for name, value in self._asdict().items()
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def __reduce__(self):
+        return type(self), tuple(self)
+
+    def _asdict(self) -> dict:
+        return dict(zip(self._fields, self))
+
+    def _replace(self, **changes):
+        return type(self)(**{**self._asdict(), **changes})
+
+
+class Event(Record):
+    __slots__ = ("start_day", "end_day", "title", "location", "series")
+    _fields = ("start_day", "end_day", "title", "location", "series", "calendar_url")
 
-class Event(NamedTuple):
     start_day: date
     end_day: date | None
     title: str
     location: str | None
     series: str
-    calendar_url: str
+
+    def __init__(
+        self,
+        start_day: date,
+        end_day: date | None,
+        title: str,
+        location: str | None,
+        series: str,
+        calendar_url: str,
+    ):
+        self._init(
+            calendar_url,
+            start_day=start_day,
+            end_day=end_day,
+            title=title,
+            location=shared(location),
+            series=shared(series),
+        )
 
     def format(self):
         dates = Event.format_date_range(self.start_day, self.end_day)
+        lines = [f"* {dates}, {self.description()}"]
+        if self.location is not None:
+            lines.append(f"{INDENT}{self.location}")
+        lines.append(f"{INDENT}{self.calendar_url}")
+        return "\n".join(lines)
+
+    def description(self):
         if self.series == "Conference":
             description = next(
-                self.title
-                for word in CONFERENCE_LIKE_WORDS
-                if self.title.startswith(word)
+                (
+                    self.title
+                    for word in CONFERENCE_LIKE_WORDS
+                    if self.title.startswith(word)
+                ),
+                None,
             )
         else:
             description = None
         if description is None:
             description = f"{self.series}, {self.title}"
-        lines = [f"* {dates}, {description}"]
-        if self.location is not None:
-            lines.append(f"{INDENT}{self.location}")
-        lines.append(f"{INDENT}{self.calendar_url}")
-        return "\n".join(lines)
+        return description
 
     def day_range(self):
         return self.start_day, self.end_day
@@ -62,7 +202,27 @@ class Event(NamedTuple):
         return f"{start_day.strftime('%B')} {start_day.day} - {start_day.strftime('%B')} {end_day.day}"
 
 
-class Seminar(NamedTuple):
+class Seminar(Record):
+    __slots__ = (
+        "day",
+        "start_time",
+        "end_time",
+        "speaker",
+        "title",
+        "location",
+        "series",
+    )
+    _fields = (
+        "day",
+        "start_time",
+        "end_time",
+        "speaker",
+        "title",
+        "location",
+        "series",
+        "calendar_url",
+    )
+
     day: date
     start_time: time | None
     end_time: time | None
@@ -70,7 +230,28 @@ class Seminar(NamedTuple):
     title: str
     location: str | None
     series: str
-    calendar_url: str
+
+    def __init__(
+        self,
+        day: date,
+        start_time: time | None,
+        end_time: time | None,
+        speaker: str | None,
+        title: str,
+        location: str | None,
+        series: str,
+        calendar_url: str,
+    ):
+        self._init(
+            calendar_url,
+            day=day,
+            start_time=start_time,
+            end_time=end_time,
+            speaker=speaker,
+            title=title,
+            location=shared(location),
+            series=shared(series),
+        )
 
     def format(self):
         lines = []
@@ -102,21 +283,226 @@ def scrape(
     stop_seminars: date,
     lang: str,
     max_events: int | None,
+    *,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    max_age: datetime.timedelta | None = None,
+    jobs: int | None = None,
 ) -> tuple[list[Event], list[Seminar]]:
     stop = max(stop_events, stop_seminars)
-    html = fetch_calendar(start, stop, lang)
+    entries = load_entries(
+        start,
+        stop,
+        lang,
+        parser=parser,
+        window=window,
+        max_workers=max_workers,
+        store=store,
+        max_age=max_age,
+        jobs=jobs,
+    )
+    return select_entries(entries, stop_events, stop_seminars, max_events)
 
-    no_entries_string = {
-        "en": r"No (upcoming |)calendar events were found",
-        "sv": r"[Kk]alenderhändelser saknas",
-    }[lang]
-    no_entries_re = re.compile(no_entries_string)
-    if html.find("h2", string=no_entries_re) or html.find("p", string=no_entries_re):
-        return [], []
 
+def scrape_weeks(
+    start: date,
+    stop_events: date,
+    stop_seminars: date,
+    lang: str,
+    max_events: int | None,
+    weeks: int,
+    *,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    max_age: datetime.timedelta | None = None,
+    jobs: int | None = None,
+) -> list[tuple[date, list[Event], list[Seminar]]]:
+    """
+    Like scrape() for `weeks` consecutive weeks from start (the stop dates
+    moving along), from one fetch of the calendar for all of them. Returns
+    the start date, events and seminars of each week.
+    """
+    stop = max(stop_events, stop_seminars) + (weeks - 1) * WEEK
+    entries = load_entries(
+        start,
+        stop,
+        lang,
+        parser=parser,
+        window=window,
+        max_workers=max_workers,
+        store=store,
+        max_age=max_age,
+        jobs=jobs,
+    )
+    return select_weeks(entries, start, stop_events, stop_seminars, max_events, weeks)
+
+
+def scrape_languages(
+    start: date,
+    stop_events: date,
+    stop_seminars: date,
+    langs: list[str],
+    max_events: int | None,
+    *,
+    weeks: int = 1,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    max_age: datetime.timedelta | None = None,
+    jobs: int | None = None,
+) -> dict[str, list[tuple[date, list[Event], list[Seminar]]]]:
+    """
+    Like scrape_weeks() for each language of `langs`, with the calendars of
+    all languages fetched concurrently. The entries listed in the calendar
+    of only some languages are added, untranslated, to the others (see
+    merge_languages).
+    """
+    stop = max(stop_events, stop_seminars) + (weeks - 1) * WEEK
+    entries = load_languages(
+        start,
+        stop,
+        langs,
+        parser=parser,
+        window=window,
+        max_workers=max_workers,
+        store=store,
+        max_age=max_age,
+        jobs=jobs,
+    )
+    return {
+        lang: select_weeks(
+            merge_languages(
+                [entries[lang]] + [entries[other] for other in langs if other != lang]
+            ),
+            start,
+            stop_events,
+            stop_seminars,
+            max_events,
+            weeks,
+        )
+        for lang in langs
+    }
+
+
+def select_weeks(
+    entries: list[Event | Seminar],
+    start: date,
+    stop_events: date,
+    stop_seminars: date,
+    max_events: int | None,
+    weeks: int,
+) -> list[tuple[date, list[Event], list[Seminar]]]:
+    """The start date, events and seminars of each week (see scrape_weeks)"""
+    digests = []
+    for number in range(weeks):
+        shift = number * WEEK
+        # The entries the calendar lists for the range of this week alone
+        week_entries = [
+            entry
+            for entry in entries
+            if overlaps(entry, start + shift, max(stop_events, stop_seminars) + shift)
+        ]
+        digests.append(
+            (
+                start + shift,
+                *select_entries(
+                    week_entries, stop_events + shift, stop_seminars + shift, max_events
+                ),
+            )
+        )
+    return digests
+
+
+def load_entries(
+    start: date,
+    stop: date,
+    lang: str,
+    *,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    max_age: datetime.timedelta | None = None,
+    jobs: int | None = None,
+) -> list[Event | Seminar]:
+    """The entries from start to stop, from the store if fresh or fetched"""
+    return load_languages(
+        start,
+        stop,
+        [lang],
+        parser=parser,
+        window=window,
+        max_workers=max_workers,
+        store=store,
+        max_age=max_age,
+        jobs=jobs,
+    )[lang]
+
+
+def load_languages(
+    start: date,
+    stop: date,
+    langs: list[str],
+    *,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    max_age: datetime.timedelta | None = None,
+    jobs: int | None = None,
+) -> dict[str, list[Event | Seminar]]:
+    """
+    Like load_entries() for each language of `langs`, fetching the calendars
+    that are not fresh in the store concurrently (see fetch_languages)
+    """
+    entries = {}
+    for lang in langs:
+        if (
+            store is not None
+            and max_age is not None
+            and not _refresh
+            and store.is_fresh(lang, start, stop, max_age)
+        ):
+            print(
+                f"Using stored entries for {start.isoformat()} - {stop.isoformat()}"
+                + (f" ({lang})" if len(langs) > 1 else "")
+            )
+            entries[lang] = store.entries(lang, start, stop)
+    missing = [lang for lang in langs if lang not in entries]
+    if missing:
+        entries.update(
+            fetch_languages(
+                start,
+                stop,
+                missing,
+                parser=parser,
+                window=window,
+                max_workers=max_workers,
+                store=store,
+                jobs=jobs,
+            )
+        )
+    return {lang: entries[lang] for lang in langs}
+
+
+def select_entries(
+    entries: list[Event | Seminar],
+    stop_events: date,
+    stop_seminars: date,
+    max_events: int | None,
+) -> tuple[list[Event], list[Seminar]]:
+    """
+    The events and seminars of a digest among `entries` (in calendar order):
+    seminars up to stop_seminars, and events up to stop_events, but at most
+    `max_events` (not counting ties) of those after stop_seminars.
+    """
     events, seminars = [], []
-    for entry in html.find_all("li", class_="calendar__event"):
-        entry = parse_calendar_entry(entry)
+    for entry in entries:
         if isinstance(entry, Event):
             if entry.start_day > stop_events:
                 continue
@@ -136,6 +522,318 @@ def scrape(
     return events, seminars
 
 
+def fetch_entries(
+    start: date,
+    stop: date,
+    lang: str,
+    *,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    jobs: int | None = None,
+) -> list[Event | Seminar]:
+    """
+    Fetch and parse the calendar entries from start to stop, in calendar order.
+
+    If `window` is given, the range is fetched concurrently in windows of that
+    many days. Entries listed in several windows (multi-day events) are only
+    kept the first time, identified by their calendar URL and start day.
+
+    With an entry_store.EntryStore `store`, entries with unchanged HTML are
+    taken from the store instead of being parsed, and the store is updated.
+    Otherwise, with `jobs`, the entries are parsed by that many processes (see
+    parse_in_processes).
+    """
+    return fetch_languages(
+        start,
+        stop,
+        [lang],
+        parser=parser,
+        window=window,
+        max_workers=max_workers,
+        store=store,
+        jobs=jobs,
+    )[lang]
+
+
+def fetch_languages(
+    start: date,
+    stop: date,
+    langs: list[str],
+    *,
+    parser: str = DEFAULT_PARSER,
+    window: int | None = None,
+    max_workers: int = MAX_WORKERS,
+    store=None,
+    jobs: int | None = None,
+) -> dict[str, list[Event | Seminar]]:
+    """
+    Like fetch_entries() for each language of `langs`, with the pages of all
+    languages fetched concurrently. The pages are parsed (and the store
+    updated) in this thread, one language after the other.
+    """
+    windows = split_range(start, stop, window)
+    requests = [(bounds, lang) for lang in langs for bounds in windows]
+    in_processes = jobs is not None and store is None
+    with contextlib.ExitStack() as stack:
+        # The pool is created before the fetching threads are started
+        if in_processes:
+            processes = stack.enter_context(parsing_processes(jobs))
+        executor = stack.enter_context(
+            concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        )
+        if not in_processes:
+            pages = executor.map(
+                lambda request: fetch_calendar(*request[0], request[1], parser),
+                requests,
+            )
+            parsed = (
+                parse_calendar(html, lang, store)
+                for (_, lang), html in zip(requests, pages)
+            )
+        else:
+            pages = executor.map(
+                lambda request: fetch_calendar_page(*request[0], request[1]), requests
+            )
+            parsed = (parse_in_processes(page, processes, jobs) for page in pages)
+        results = {}
+        for lang in langs:
+            entries, seen = [], set()
+            for page_entries in itertools.islice(parsed, len(windows)):
+                entries.extend(
+                    entry for entry in page_entries if entry_key(entry) not in seen
+                )
+                seen.update(entry_key(entry) for entry in page_entries)
+            if store is not None:
+                print(store.update(lang, start, stop).format())
+            results[lang] = entries
+    return results
+
+
+def archive_entries(
+    start: date,
+    stop: date,
+    lang: str,
+    store,
+    window: int,
+    *,
+    parser: str = DEFAULT_PARSER,
+    max_workers: int = MAX_WORKERS,
+) -> int:
+    """
+    Fetch the calendar from start to stop in windows of `window` days into the
+    entry_store.EntryStore `store`, and return the number of windows fetched.
+
+    Every window is stored as soon as it is parsed, and windows stored by a
+    previous run are skipped (unless refreshing), so an interrupted run can be
+    resumed. At most `max_workers` pages are held in memory at a time, however
+    long the range.
+    """
+    windows = [
+        bounds
+        for bounds in split_range(start, stop, window)
+        if _refresh or not store.is_fresh(lang, *bounds)
+    ]
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for offset in range(0, len(windows), max_workers):
+            batch = windows[offset : offset + max_workers]
+            pages = executor.map(
+                lambda bounds: fetch_calendar(*bounds, lang, parser), batch
+            )
+            for (window_start, window_stop), html in zip(batch, pages):
+                entries = parse_calendar(html, lang, store)
+                changes = store.update(lang, window_start, window_stop)
+                print(
+                    f"Stored {len(entries)} entries for {window_start.isoformat()}"
+                    f" - {window_stop.isoformat()} ({len(changes.added)} added,"
+                    f" {len(changes.changed)} changed, {len(changes.removed)} removed)"
+                )
+    return len(windows)
+
+
+def split_range(
+    start: date, stop: date, window: int | None
+) -> list[tuple[date, date]]:
+    if window is None:
+        return [(start, stop)]
+    if window < 1:
+        raise ValueError("Window must be at least one day")
+    step = datetime.timedelta(days=window)
+    windows = []
+    while start <= stop:
+        windows.append((start, min(start + step - datetime.timedelta(days=1), stop)))
+        start += step
+    return windows
+
+
+def overlaps(entry: Event | Seminar, start: date, stop: date) -> bool:
+    if isinstance(entry, Event):
+        return entry.start_day <= stop and (entry.end_day or entry.start_day) >= start
+    return start <= entry.day <= stop
+
+
+def entry_key(entry: Event | Seminar) -> tuple[str, date]:
+    return (
+        entry.calendar_url,
+        entry.start_day if isinstance(entry, Event) else entry.day,
+    )
+
+
+def calendar_id(url: str) -> str | None:
+    """
+    The ID of a calendar entry, the same in all languages: the Polopoly
+    content ID which ends the path of its URL
+    """
+    match = CALENDAR_ID_RE.search(url)
+    return match.group(1) if match is not None else None
+
+
+def join_key(entry: Event | Seminar) -> tuple[str, date]:
+    """
+    Like entry_key(), but the same for the entry in all languages: its
+    calendar ID (or else the path of its URL without the language prefix) and
+    its start day
+    """
+    content_id = calendar_id(entry.calendar_url)
+    if content_id is None:
+        content_id = split_url(entry.calendar_url)[1]
+        if content_id.startswith("/en/"):
+            content_id = content_id[len("/en") :]
+    return content_id, entry_key(entry)[1]
+
+
+def merge_languages(
+    entries: list[list[Event | Seminar]],
+) -> list[Event | Seminar]:
+    """
+    The entries of the first list (of a calendar in one language), with the
+    entries of the other lists (the calendars in other languages) missing from
+    it. Entries are joined by calendar ID and start day (join_key()), or by
+    calendar ID alone if it is listed once in both lists, on different days.
+    A missing entry is placed after the entry before it in its own list, but
+    not before entries starting earlier, so that the calendar order is kept.
+    Missing entries without a calendar ID are reported, as they may be listed
+    in the first list under another path.
+    """
+    merged, *others = entries
+    for other in others:
+        keys = {join_key(entry) for entry in merged}
+        days = defaultdict(list)
+        for key in keys:
+            days[key[0]].append(key)
+        other_days = Counter(join_key(entry)[0] for entry in other)
+        after = defaultdict(list)
+        previous = None
+        for entry in other:
+            key = join_key(entry)
+            has_id = calendar_id(entry.calendar_url) is not None
+            if key in keys:
+                previous = key
+            elif has_id and len(days[key[0]]) == 1 and other_days[key[0]] == 1:
+                # The same entry, listed on another day in this language
+                previous = days[key[0]][0]
+            else:
+                if not has_id:
+                    print(
+                        f"Warning: No calendar ID for {entry.title}"
+                        f" ({entry.calendar_url}), joined by path and day"
+                    )
+                after[previous].append(entry)
+        if not after:
+            continue
+        result = []
+        pending = deque(after.pop(None, []))
+        for entry in merged:
+            day = entry_key(entry)[1]
+            while pending and entry_key(pending[0])[1] <= day:
+                result.append(pending.popleft())
+            result.append(entry)
+            pending.extend(after.pop(join_key(entry), ()))
+        result.extend(pending)
+        merged = result
+    return merged
+
+
+def parsing_processes(jobs: int) -> concurrent.futures.ProcessPoolExecutor:
+    """
+    A pool of `jobs` processes for parse_in_processes. They are started by a
+    fork server where available (spawned otherwise), not forked from this
+    process, whose fetching threads may hold locks. The profiling spans of
+    the processes are not recorded.
+    """
+    import multiprocessing
+
+    if "forkserver" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("forkserver")
+        # Forked from a server which has already imported the parser
+        context.set_forkserver_preload([__name__])
+    else:
+        context = multiprocessing.get_context("spawn")
+    # SMC_URL may have been changed since the import of the module
+    return concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        mp_context=context,
+        initializer=set_smc_url,
+        initargs=(SMC_URL,),
+    )
+
+
+def parse_in_processes(page: bytes, processes, jobs: int) -> list[Event | Seminar]:
+    """
+    Parse the calendar entries of `page` like parse_calendar(parse_html(page,
+    CALENDAR_ENTRIES, "lxml")): the entries are split from the page by lxml,
+    and parsed in CHUNKS_PER_JOB chunks per job by the process pool
+    `processes` (see parsing_processes). The warnings of the processes are
+    printed, and the entries returned, in document order.
+    """
+    with profiling.span("parse_in_processes"):
+        fragments = select_html(page, CALENDAR_ENTRIES)
+        size = max(1, -(-len(fragments) // (jobs * CHUNKS_PER_JOB)))
+        chunks = [
+            processes.submit(parse_chunk, fragments[first : first + size])
+            for first in range(0, len(fragments), size)
+        ]
+        entries = []
+        for chunk in chunks:
+            chunk_entries, output = chunk.result()
+            print(end=output)
+            entries.extend(chunk_entries)
+        return entries
+
+
+def parse_chunk(fragments: list[str]) -> tuple[list[Event | Seminar], str]:
+    """The entries parsed from the HTML `fragments`, and the warnings printed"""
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        html = parse_html("".join(fragments))
+        entries = [
+            parse_calendar_entry(entry)
+            for entry in html.find_all("li", class_="calendar__event")
+        ]
+    return entries, output.getvalue()
+
+
+def set_smc_url(url: str):
+    """Initializer of the parsing processes"""
+    global SMC_URL
+    SMC_URL = url
+
+
+def parse_calendar(html, lang, store=None) -> list[Event | Seminar]:
+    no_entries_string = {
+        "en": r"No (upcoming |)calendar events were found",
+        "sv": r"[Kk]alenderhändelser saknas",
+    }[lang]
+    no_entries_re = re.compile(no_entries_string)
+    if html.find("h2", string=no_entries_re) or html.find("p", string=no_entries_re):
+        return []
+    entries = html.find_all("li", class_="calendar__event")
+    if store is not None:
+        return [store.parse(lang, entry, parse_calendar_entry) for entry in entries]
+    return [parse_calendar_entry(entry) for entry in entries]
+
+
+@profiling.spanned("parse_calendar_entry")
 def parse_calendar_entry(html) -> Event | Seminar:
 
     day, end_day = parse_days(html)
@@ -149,12 +847,13 @@ def parse_calendar_entry(html) -> Event | Seminar:
     end_time = parse_time(end_time)
 
     title = html.find("div").find("a")["title"]
+    rows = entry_rows(html)
 
     calendar_url = html.find("div").find("a")["href"]
     calendar_url = calendar_url.split("?")[0]
-    calendar_url = f"https://www.math-stockholm.se{calendar_url}"
+    calendar_url = f"{SMC_URL}{calendar_url}"
 
-    location = parse_location(html)
+    location = parse_location(rows)
     if not location:
         print(f"Warning: Did not find either location or video link for {title}")
     if is_event(series, day, end_day):
@@ -163,7 +862,7 @@ def parse_calendar_entry(html) -> Event | Seminar:
         return Event(day, end_day, title, location, series, calendar_url)
 
     # Speaker and title
-    title, speaker = split_title_and_speaker(title, html)
+    title, speaker = split_title_and_speaker(title, rows)
     if not speaker:
         print(
             f"Warning: Did not find {'/'.join(ALTERNATE_SPEAKER_TAGS)} for {speaker}: {title}"
@@ -181,10 +880,10 @@ def is_event(series: str, start_day: date | None, end_day: date | None) -> bool:
     )
 
 
-def parse_location(html):
-    location = find_row(html, "Location:", "calendar__eventinfo-location")
+def parse_location(rows):
+    location = find_row_value(rows, "Location:", "calendar__eventinfo-location")
 
-    video = find_row(html, "Video link:", "calendar__eventinfo-location")
+    video = find_row_value(rows, "Video link:", "calendar__eventinfo-location")
     if video:
         location = f"{location} ({video})" if location else video
 
@@ -209,7 +908,7 @@ def parse_time(string) -> time | None:
         return None
 
 
-def split_title_and_speaker(title, html) -> tuple[str, str | None]:
+def split_title_and_speaker(title, rows) -> tuple[str, str | None]:
 
     try:
         speaker, title = title.split(":", 1)
@@ -220,7 +919,7 @@ def split_title_and_speaker(title, html) -> tuple[str, str | None]:
     for alternate_speaker_tag in ALTERNATE_SPEAKER_TAGS:
         if speaker != "":
             break
-        speaker = find_row(html, f"{alternate_speaker_tag}:")
+        speaker = find_row_value(rows, f"{alternate_speaker_tag}:")
     title = unescape_html(title)
     speaker = unescape_html(speaker)
     if speaker == "":
@@ -228,36 +927,102 @@ def split_title_and_speaker(title, html) -> tuple[str, str | None]:
     return title, speaker
 
 
-def find_row(entry, header, class_=None):
-    divs = (
-        entry.find_all("p", class_=class_) if class_ is not None else entry.findAll("p")
-    )
-    for div in divs:
-        terms = div()
-        with contextlib.suppress(IndexError):
-            if terms[0].string.strip() == header:
-                return unescape_html(terms[1].string.strip())
+def entry_rows(entry) -> dict[str, list[tuple[list[str], str | None]]]:
+    """
+    The rows of a calendar entry, in one pass over its <p> elements: a map
+    from the text of the first tag in a <p> (such as "Location:") to the
+    classes of the <p> and the text of its second tag, in document order.
+    """
+    rows = defaultdict(list)
+    for row in entry.find_all("p"):
+        terms = row.find_all(True, limit=2)
+        if len(terms) < 2 or terms[0].string is None:
+            continue
+        rows[terms[0].string.strip()].append((row.get("class") or [], terms[1].string))
+    return rows
+
+
+def find_row_value(rows, header, class_=None):
+    """The value of the first row with `header` (and `class_`) in entry_rows"""
+    for classes, value in rows.get(header, ()):
+        if class_ is None or class_ in classes:
+            return unescape_html(value.strip())
     return ""
 
 
+def find_row(entry, header, class_=None):
+    return find_row_value(entry_rows(entry), header, class_)
+
+
 def parse_span(html, class_):
     result = html.find("span", class_=class_)
     result = "" if result is None else result.string
     return result.strip()
 
 
-def fetch_calendar(start, stop, lang):
-    url = construct_url(start, stop, lang)
+def configure_cache(enabled: bool = True, refresh: bool = False, ttl=CACHE_TTL):
+    """
+    Set up the session used to fetch the calendar. With `refresh`, cached
+    pages are downloaded again (and the cache updated). The responses are
+    recorded or replayed as configured in transport.
+    """
+    global _session, _refresh
+    _refresh = refresh
+    _session = transport.session(lambda: open_session(enabled, ttl))
+    return _session
+
+
+def open_session(enabled: bool, ttl):
+    if enabled:
+        try:
+            import requests_cache
+        except ImportError:
+            print("Warning: requests_cache is not installed, not caching the calendar")
+        else:
+            return requests_cache.CachedSession(
+                cache_name=CACHE_NAME,
+                backend="sqlite",
+                expire_after=ttl,
+                always_revalidate=True,
+            )
+    import requests
+
+    return requests.Session()
+
+
+def get_session():
+    with _lock:
+        if _session is None:
+            configure_cache()
+        return _session
+
 
-    print(f"Fetching seminars for {start.isoformat()} - {stop.isoformat()} ({lang})")
+def fetch_calendar(start, stop, lang, parser=DEFAULT_PARSER):
+    return parse_html(fetch_calendar_page(start, stop, lang), CALENDAR_ENTRIES, parser)
 
-    raw_content = urlopen(url)
-    return BeautifulSoup(raw_content, features="lxml")
+
+@profiling.spanned("fetch_calendar")
+def fetch_calendar_page(start, stop, lang) -> bytes:
+    url = construct_url(start, stop, lang)
+
+    session = get_session()
+    if _refresh and hasattr(session, "cache"):
+        response = session.get(url, force_refresh=True)
+    else:
+        response = session.get(url)
+    response.raise_for_status()
+    profiling.record_response("fetch_calendar", response)
+    with _lock:  # may be called from several threads
+        print(
+            f"Fetching seminars for {start.isoformat()} - {stop.isoformat()} ({lang})"
+            + cache_info(response)
+        )
+    return response.content
 
 
 def construct_url(start, stop, lang):
     length = (stop - start).days + 1
-    url = f"https://www.math-stockholm.se/{'en/' if lang == 'en' else ''}kalender"
+    url = f"{SMC_URL}/{'en/' if lang == 'en' else ''}kalender"
     url += f"?date={start.isoformat()}&length={length}"
     # url += "&l=en_UK"
     return url
@@ -0,0 +1,261 @@
+"""Delivery of email over a pool of SMTP connections.
+
+Envelopes are taken from a shared iterator by one thread per connection, at a
+rate limited by a token bucket. On transient errors (dropped connections,
+4xx replies) before the message data is sent, the connection is reopened and
+the envelope sent again. If the connection fails while the message data is
+sent or its reply awaited, the message may have been delivered: it is not
+sent again, and its recipients are reported as possibly delivered.
+
+An envelope may have several recipients, which are then sent the message in
+one SMTP transaction (one RCPT TO per recipient).
+"""
+from __future__ import annotations
+
+import itertools
+import smtplib
+import threading
+import time
+from typing import Callable, Iterable, Iterator, NamedTuple
+
+import profiling
+
+RETRIES = 3
+RETRY_DELAY = 2.0  # seconds, multiplied by the attempt number
+# Recipients per transaction when batching by domain without a batch size
+MAX_BATCH = 50
+
+
+class Envelope(NamedTuple):
+    sender: str
+    recipients: list[str]
+    message: str | bytes
+
+
+class Status(NamedTuple):
+    recipient: str
+    ok: bool
+    detail: str
+    # Not known to be delivered, but the message data was sent (ok is False)
+    uncertain: bool = False
+
+
+class PossiblyDelivered(smtplib.SMTPException):
+    """
+    The connection failed once the message data of a transaction was being
+    sent, with the status of every recipient of the envelope
+    """
+
+    def __init__(self, statuses: list[Status]):
+        super().__init__("Possibly delivered")
+        self.statuses = statuses
+
+
+class TokenBucket:
+    """
+    Rate limiter: acquire() returns at most `rate` times per second on
+    average, with bursts of at most `capacity`.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(
+                    self.capacity, self.tokens + (now - self.updated) * self.rate
+                )
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+
+def is_transient(error: Exception) -> bool:
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    if isinstance(error, smtplib.SMTPServerDisconnected):
+        return True
+    # SMTPException is a subclass of OSError
+    return isinstance(error, OSError) and not isinstance(
+        error, smtplib.SMTPException
+    )
+
+
+@profiling.spanned("smtp_send")
+def send(server: smtplib.SMTP, envelope: Envelope) -> list[Status]:
+    """
+    Send `envelope` in one SMTP transaction and return the status of every
+    recipient: the reply to its RCPT TO if refused, otherwise the reply to the
+    message data. Raises PossiblyDelivered if the connection fails once the
+    server has accepted to receive the message data.
+    """
+    server.ehlo_or_helo_if_needed()
+    code, reply = server.mail(envelope.sender)
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPSenderRefused(code, reply, envelope.sender)
+    replies = {}
+    for recipient in envelope.recipients:
+        replies[recipient] = server.rcpt(recipient)
+    accepted = {
+        recipient for recipient, (code, _) in replies.items() if code in (250, 251)
+    }
+    if not accepted:
+        server.rset()
+        raise smtplib.SMTPRecipientsRefused(replies)
+    try:
+        code, reply = server.data(envelope.message)
+    except smtplib.SMTPDataError:
+        # DATA refused: the message data was not sent
+        raise
+    except OSError as error:
+        detail = f"Possibly delivered, {type(error).__name__}: {error}"
+        raise PossiblyDelivered(
+            [
+                Status(recipient, False, detail, uncertain=True)
+                if recipient in accepted
+                else Status(recipient, False, describe(*replies[recipient]))
+                for recipient in envelope.recipients
+            ]
+        ) from error
+    profiling.record("smtp_send", len(envelope.message))
+    if code != 250:
+        server.rset()
+        raise smtplib.SMTPDataError(code, reply)
+    return [
+        Status(recipient, True, describe(code, reply))
+        if recipient in accepted
+        else Status(recipient, False, describe(*replies[recipient]))
+        for recipient in envelope.recipients
+    ]
+
+
+def batches(
+    recipients: Iterable[str], size: int | None = None, by_domain: bool = False
+) -> Iterator[list[str]]:
+    """
+    Split `recipients` into lists of at most `size` recipients (at most
+    MAX_BATCH if only batching by domain), in order. With `by_domain`, the
+    recipients of each list share the domain of their addresses.
+    """
+    if by_domain:
+        domains = {}
+        for recipient in recipients:
+            domain = recipient.rpartition("@")[2].lower()
+            domains.setdefault(domain, []).append(recipient)
+        groups = domains.values()
+        size = size or MAX_BATCH
+    else:
+        groups = [recipients]
+        size = size or 1
+    for group in groups:
+        group = iter(group)
+        batch = list(itertools.islice(group, size))
+        while batch:
+            yield batch
+            batch = list(itertools.islice(group, size))
+
+
+def describe(code: int, message: bytes | str) -> str:
+    if isinstance(message, bytes):
+        message = message.decode(errors="replace")
+    return f"{code} {message}"
+
+
+def close(server: smtplib.SMTP | None):
+    if server is None:
+        return
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def deliver(
+    envelopes: Iterable[Envelope],
+    connect: Callable[[], smtplib.SMTP],
+    connections: int = 1,
+    rate: float | None = None,
+    retries: int = RETRIES,
+    retry_delay: float = RETRY_DELAY,
+    report: Callable[[Status], None] | None = None,
+) -> list[Status]:
+    """
+    Send `envelopes` over `connections` SMTP connections opened (and logged
+    in) by `connect`, at most `rate` envelopes per second in total.
+
+    Returns the status of every recipient, in the order of the envelopes.
+    `report` is called (from the sending threads, one at a time) with each
+    status as soon as it is known.
+    """
+    envelopes = iter(enumerate(envelopes))
+    envelopes_lock = threading.Lock()
+    results = {}
+    results_lock = threading.Lock()
+    bucket = TokenBucket(rate) if rate else None
+
+    def next_envelope():
+        with envelopes_lock:
+            return next(envelopes, None)
+
+    def finish(index: int, statuses: list[Status]):
+        with results_lock:
+            results[index] = statuses
+            if report is not None:
+                for status in statuses:
+                    report(status)
+
+    def work():
+        server = None
+        try:
+            while True:
+                item = next_envelope()
+                if item is None:
+                    break
+                index, envelope = item
+                for attempt in range(retries + 1):
+                    if bucket is not None:
+                        bucket.acquire()
+                    try:
+                        if server is None:
+                            server = connect()
+                        statuses = send(server, envelope)
+                        break
+                    except PossiblyDelivered as error:
+                        # Not sent again: the recipients could get it twice
+                        statuses = error.statuses
+                        close(server)
+                        server = None
+                        break
+                    except Exception as error:
+                        if not is_transient(error) or attempt == retries:
+                            detail = f"{type(error).__name__}: {error}"
+                            statuses = [
+                                Status(recipient, False, detail)
+                                for recipient in envelope.recipients
+                            ]
+                            break
+                        close(server)
+                        server = None
+                        time.sleep(retry_delay * (attempt + 1))
+                finish(index, statuses)
+        finally:
+            close(server)
+
+    threads = [threading.Thread(target=work) for _ in range(max(connections, 1))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return [status for index in sorted(results) for status in results[index]]
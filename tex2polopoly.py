@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+"""Convert simple TeX code to Polopoly HTML source, in one process.
+
+The output is the same as that of convert-tex-to-polopoly.sh: paragraphs
+(separated by blank lines) become <p>...</p> lines, $...$ becomes
+<span class="math-tex">\\(...\\)</span>, \\emph{...} and \\textit{...} become
+<i>...</i>, ``...'' and `...' curly quotes, "\\ " a space and ~ &nbsp;. Like
+the script, the output has no final newline.
+
+# Usage
+ python tex2polopoly.py abstract.tex > abstract.html
+ python tex2polopoly.py < abstract.tex > abstract.html
+
+ As the script, the files given (or standard input) are concatenated and
+ converted as one text.
+
+ python tex2polopoly.py --output-dir html --jobs 4 abstracts/ more.tex
+
+ The above run converts every file separately to html/NAME.html: the .tex
+ files of the directory abstracts/ and more.tex, in 4 processes.
+
+convert() converts a string, and convert_entry() the named fields of an entry
+of iml_scraper.parse_seminar.
+"""
+from __future__ import annotations
+
+import argparse
+import concurrent.futures
+import os
+import re
+import sys
+
+# Line breaks are first replaced by this character, as by `tr` in the script
+EOL = "\x01"
+TRAILING_EOL_RE = re.compile(EOL + "+\\Z")
+PARAGRAPH_BREAK_RE = re.compile(EOL + EOL + "+")
+# The sed expressions of the script, applied in order to each <p>...</p> line
+RULES = [
+    (re.compile(pattern), replacement)
+    for pattern, replacement in [
+        (r"\$([^$]*)\$", r'<span class="math-tex">\\(\1\\)</span>'),
+        (r"\\(emph|textit)\{([^}]*)\}", r"<i>\2</i>"),
+        (r"``([^`']*)''", "\u201c\\1\u201d"),
+        (r"`([^`']*)'", "\u2018\\1\u2019"),
+        (r"([^\\])\\ ", r"\1 "),
+        (r"~", "&nbsp;"),
+    ]
+]
+# Undecodable bytes are passed through, as by the script
+ENCODING = "utf-8"
+ERRORS = "surrogateescape"
+
+
+def convert(tex: str) -> str:
+    text = TRAILING_EOL_RE.sub("", tex.replace("\n", EOL))
+    text = PARAGRAPH_BREAK_RE.sub("\n", text).replace(EOL, " ")
+    if not text:
+        return ""
+    return "\n".join(convert_line(f"<p>{line}</p>") for line in text.split("\n"))
+
+
+def convert_line(line: str) -> str:
+    for pattern, replacement in RULES:
+        line = pattern.sub(replacement, line)
+    return line
+
+
+def convert_entry(entry: dict, fields: list[str]) -> dict:
+    """
+    A copy of the entry `entry` of iml_scraper.parse_seminar with its `fields`
+    converted: "title", "speaker" or headers of its other fields (such as
+    "Location"). A field the entry does not have raises KeyError.
+    """
+    entry = {**entry, "other_fields": dict(entry["other_fields"])}
+    for field in fields:
+        if field in ("title", "speaker"):
+            values = entry
+        elif field in entry["other_fields"]:
+            values = entry["other_fields"]
+        else:
+            raise KeyError(f"No field {field!r} in the IML entry")
+        if values[field] is not None:
+            values[field] = convert(values[field])
+    return entry
+
+
+def convert_file(source: str, destination: str):
+    with open(source, encoding=ENCODING, errors=ERRORS, newline="") as tex:
+        html = convert(tex.read())
+    with open(destination, "w", encoding=ENCODING, errors=ERRORS, newline="") as output:
+        output.write(html)
+
+
+def input_files(paths: list[str]) -> list[str]:
+    """The files of `paths`, with the .tex files of the directories among them"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith(".tex") and os.path.isfile(os.path.join(path, name))
+            )
+        else:
+            files.append(path)
+    return files
+
+
+def convert_files(files: list[str], output_dir: str, jobs: int | None = None):
+    """Convert each file of `files` to output_dir/NAME.html, in `jobs` processes"""
+    destinations = [
+        os.path.join(output_dir, os.path.splitext(os.path.basename(source))[0])
+        + ".html"
+        for source in files
+    ]
+    if len(set(destinations)) < len(destinations):
+        raise ValueError("Several input files have the same name")
+    if jobs is None or jobs == 1:
+        for source, destination in zip(files, destinations):
+            convert_file(source, destination)
+        return
+    with concurrent.futures.ProcessPoolExecutor(max_workers=jobs) as executor:
+        # Files are converted in batches, each file is small
+        for _ in executor.map(
+            convert_file,
+            files,
+            destinations,
+            chunksize=max(1, len(files) // (jobs * 4)),
+        ):
+            pass
+
+
+def build_parser(prog=None):
+    parser = argparse.ArgumentParser(prog=prog)
+    parser.add_argument(
+        "files",
+        nargs="*",
+        help="TeX files, or with --output-dir also directories of .tex files (default: standard input)",
+        metavar="FILE",
+    )
+    parser.add_argument(
+        "--output-dir",
+        action="store",
+        help="convert each file separately to DIR/NAME.html instead of writing the concatenated files to standard output",
+        metavar="DIR",
+    )
+    parser.add_argument(
+        "--jobs",
+        action="store",
+        type=int,
+        help="number of processes converting files with --output-dir",
+        metavar="N",
+    )
+    return parser
+
+
+def main(argv=None, prog=None):
+    args = build_parser(prog).parse_args(argv)
+
+    if args.jobs is not None and args.jobs < 1:
+        raise ValueError("--jobs must be at least 1")
+
+    if args.output_dir is not None:
+        if not args.files:
+            raise ValueError("--output-dir requires input files")
+        os.makedirs(args.output_dir, exist_ok=True)
+        convert_files(input_files(args.files), args.output_dir, args.jobs)
+        return
+
+    if args.files:
+        parts = []
+        for path in args.files:
+            with open(path, encoding=ENCODING, errors=ERRORS, newline="") as tex:
+                parts.append(tex.read())
+        tex = "".join(parts)
+    else:
+        tex = sys.stdin.buffer.read().decode(ENCODING, ERRORS)
+    sys.stdout.buffer.write(convert(tex).encode(ENCODING, ERRORS))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Recording and replay of the HTTP responses of the scrapers.
+
+smc_scraper and iml_scraper open their sessions through session(). After
+configure(record=DIR), the responses they get are also written to DIR, one
+gzipped file per URL; after configure(replay=DIR), they are read from there
+instead, without any network access (a URL that was not recorded raises
+FileNotFoundError). The scripts select this with --record DIR / --replay DIR:
+
+ python semads.py --start 20240101 --output message.txt --record recorded
+ python semads.py --start 20240101 --output message.txt --replay recorded
+
+The date of the recording is kept with it and returned by today() while
+replaying, so that scripts whose dates depend on the day request the same
+URLs.
+"""
+from __future__ import annotations
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+
+RECORDING_INFO = "recording.json"
+# Headers describing the transfer of the body, which is stored decoded
+TRANSFER_HEADERS = {"content-encoding", "content-length", "transfer-encoding"}
+
+_record = None
+_replay = None
+
+
+def configure(record: str | None = None, replay: str | None = None):
+    global _record, _replay
+    if record is not None and replay is not None:
+        raise ValueError("Cannot both record and replay responses")
+    _record, _replay = record, replay
+    if record is not None:
+        os.makedirs(record, exist_ok=True)
+        with open(os.path.join(record, RECORDING_INFO), "w") as info:
+            json.dump({"date": datetime.date.today().isoformat()}, info)
+
+
+def today() -> datetime.date:
+    """Today, or the day of the recording being replayed"""
+    if _replay is not None:
+        with open(os.path.join(_replay, RECORDING_INFO)) as info:
+            return datetime.date.fromisoformat(json.load(info)["date"])
+    return datetime.date.today()
+
+
+def session(open_session):
+    """
+    The session to get pages with: the one returned by `open_session()`,
+    recording its responses if configured so, or a replay of recorded ones
+    """
+    if _replay is not None:
+        return Replay(_replay)
+    if _record is not None:
+        return Recorder(open_session(), _record)
+    return open_session()
+
+
+def recording_path(directory: str, url: str) -> str:
+    return os.path.join(directory, hashlib.sha1(url.encode()).hexdigest() + ".gz")
+
+
+class Recorder:
+    """A session that writes the responses of get() to `directory`"""
+
+    def __init__(self, session, directory: str):
+        self.session = session
+        self.directory = directory
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    def get(self, url: str, **kwargs):
+        response = self.session.get(url, **kwargs)
+        info = {
+            "url": url,
+            "final_url": response.url,
+            "status_code": response.status_code,
+            "reason": response.reason,
+            "headers": {
+                name: value
+                for name, value in response.headers.items()
+                if name.lower() not in TRANSFER_HEADERS
+            },
+            "encoding": response.encoding,
+        }
+        data = json.dumps(info).encode() + b"\n" + response.content
+        # Threads may record the same URL: replace the file at once
+        with tempfile.NamedTemporaryFile(dir=self.directory, delete=False) as output:
+            output.write(gzip.compress(data))
+        os.replace(output.name, recording_path(self.directory, url))
+        return response
+
+
+class Replay:
+    """A session whose get() returns the responses recorded in `directory`"""
+
+    def __init__(self, directory: str):
+        self.directory = directory
+
+    def get(self, url: str, **kwargs):
+        import requests
+
+        path = recording_path(self.directory, url)
+        try:
+            with open(path, "rb") as recorded:
+                data = gzip.decompress(recorded.read())
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                f"No response to {url} recorded in {self.directory}"
+            ) from None
+        header, content = data.split(b"\n", 1)
+        info = json.loads(header)
+        response = requests.Response()
+        response.url = info["final_url"]
+        response.status_code = info["status_code"]
+        response.reason = info["reason"]
+        response.headers = requests.structures.CaseInsensitiveDict(info["headers"])
+        response.encoding = info["encoding"]
+        response._content = content
+        response.request = requests.Request("GET", url).prepare()
+        return response
+
+    def close(self):
+        pass
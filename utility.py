@@ -1,15 +1,176 @@
+from __future__ import annotations
+
+import datetime
+import functools
+import html
+import re
+import time
 import warnings
+from typing import TYPE_CHECKING
+
+import profiling
+
+# BeautifulSoup and lxml are slow to import and only imported when first used
+if TYPE_CHECKING:
+    from bs4 import BeautifulSoup
+
+# "bs4" builds a BeautifulSoup tree of the whole page, "lxml" only of the
+# subtrees selected by a compiled XPath expression.
+PARSERS = ["lxml", "bs4"]
+DEFAULT_PARSER = "lxml"
 
-from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+# Titles, speakers, series and rooms repeat a lot between calendar entries
+UNESCAPE_CACHE_SIZE = 4096
 
-# supress bs warnings when unescaping html from url-looking strings
-warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
+# Strings which the lxml HTML parser does not return verbatim (up to character
+# references): markup, carriage returns, NUL, byte order marks and leading
+# whitespace.
+_NOT_PLAIN_RE = re.compile("[<\r\x00\ufeff]|^[ \t\n\f]")
+_REFERENCE_RE = re.compile(r"&(?:#[0-9]+;|#[xX][0-9a-fA-F]+;|[A-Za-z][A-Za-z0-9]*;)?")
 
 
+@functools.lru_cache(maxsize=UNESCAPE_CACHE_SIZE)
 def unescape_html(string: str) -> str:
     if not string:
         return ""
-    unescaped = BeautifulSoup(string, features="lxml").string
+    if is_plain_text(string):
+        return html.unescape(string)
+    return soup_unescape_html(string)
+
+
+@functools.lru_cache(maxsize=None)
+def beautiful_soup():
+    """The BeautifulSoup class, imported on first use"""
+    from bs4 import BeautifulSoup, MarkupResemblesLocatorWarning
+
+    # supress bs warnings when unescaping html from url-looking strings
+    warnings.filterwarnings("ignore", category=MarkupResemblesLocatorWarning)
+    return BeautifulSoup
+
+
+@functools.lru_cache(maxsize=None)
+def compile_xpath(expression: str):
+    from lxml import etree
+
+    return etree.XPath(expression)
+
+
+def soup_unescape_html(string: str) -> str:
+    unescaped = beautiful_soup()(string, features="lxml").string
     if unescaped is None:
         raise ValueError(f"Failed to unescape: {string}")
-    return unescaped
+    # Do not keep a reference to the soup
+    return str(unescaped)
+
+
+def is_plain_text(string: str) -> bool:
+    """
+    Whether html.unescape() gives the same result as parsing `string` as
+    HTML: no markup or special characters, and only character references
+    that the lxml HTML parser resolves in the same way (with a semicolon,
+    and no control characters or non-characters).
+    """
+    if _NOT_PLAIN_RE.search(string):
+        return False
+    for match in _REFERENCE_RE.finditer(string):
+        reference = match.group()
+        if reference == "&" or reference in ("&Tab;", "&NewLine;"):
+            return False
+        if reference.startswith("&#"):
+            if reference[2] in "xX":
+                codepoint = int(reference[3:-1], 16)
+            else:
+                codepoint = int(reference[2:-1])
+            if not (
+                0x20 <= codepoint < 0x7F
+                or 0xA0 <= codepoint < 0xD800
+                or 0xE000 <= codepoint < 0xFDD0
+                or 0xFDF0 <= codepoint < 0xFFFE
+            ):
+                return False
+    return True
+
+
+def xpath_class(class_: str) -> str:
+    """XPath predicate matching elements with `class_` among their classes"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {class_} ')"
+
+
+@profiling.spanned("parse_html")
+def parse_html(
+    markup, selector: str | None = None, parser: str = DEFAULT_PARSER
+) -> BeautifulSoup:
+    """
+    Parse `markup` (str, bytes or file-like object) into a BeautifulSoup tree.
+
+    With the "lxml" parser and an XPath expression `selector`, the page is
+    parsed by lxml and only the selected subtrees are built into the returned
+    tree, in document order. Subtrees nested in other selected subtrees are
+    only included once, as part of the outer one.
+    """
+    BeautifulSoup = beautiful_soup()
+    if parser == "bs4" or selector is None:
+        return BeautifulSoup(markup, features="lxml")
+    if parser != "lxml":
+        raise ValueError(f'Unknown parser "{parser}", expected one of {PARSERS}')
+    return BeautifulSoup("".join(select_html(markup, selector)), features="lxml")
+
+
+def select_html(markup, selector: str) -> list[str]:
+    """
+    The HTML of the subtrees of `markup` selected by the XPath expression
+    `selector`, as parse_html(markup, selector, "lxml") builds them
+    """
+    import lxml.html
+    from bs4.dammit import UnicodeDammit
+
+    if hasattr(markup, "read"):
+        markup = markup.read()
+    if isinstance(markup, bytes):
+        # Same encoding detection as BeautifulSoup
+        markup = UnicodeDammit(markup, is_html=True).unicode_markup
+    if not markup.strip():
+        return []
+    document = lxml.html.document_fromstring(markup)
+    selected = set()
+    fragments = []
+    for element in compile_xpath(selector)(document):
+        if any(ancestor in selected for ancestor in element.iterancestors()):
+            continue
+        selected.add(element)
+        fragments.append(
+            lxml.html.tostring(element, encoding="unicode", with_tail=False)
+        )
+    return fragments
+
+
+def utc2local(utc):
+    epoch = time.mktime(utc.timetuple())
+    offset = datetime.datetime.fromtimestamp(epoch) - datetime.datetime.utcfromtimestamp(epoch)
+    return utc + offset
+
+
+def cache_info(response) -> str:
+    """Describe whether `response` was served from a requests_cache cache"""
+    if not getattr(response, "from_cache", False):
+        return ""
+    return cache_status(
+        response.expires,
+        getattr(response, "revalidated", False),
+        response.is_expired,
+    )
+
+
+def cache_status(expires, revalidated=False, expired=False) -> str:
+    """Describe a cached response expiring at `expires` (UTC, None for never)"""
+    if not expires:
+        when = "forever"
+    else:
+        expiredate = utc2local(expires)
+        if expiredate.date() != datetime.date.today():
+            when = f"until {expiredate.date().isoformat()}"
+        else:
+            when = f"until {expiredate.time().isoformat(timespec='minutes')}"
+    revalidated = " revalidated" if revalidated else ""
+    expired = " expired!" if expired else ""
+    return f" [CACHED {when}{revalidated}{expired}]"